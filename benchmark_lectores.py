@@ -0,0 +1,53 @@
+import os
+import sys
+import time
+import tempfile
+import numpy as np
+import pandas as pd
+import lector_excel
+
+# Benchmark de motores de lectura de Excel sobre archivos con la forma de
+# archivos_cliente/ventas_*.xlsx, escalados a tamaños "de fin de mes".
+# Uso: python benchmark_lectores.py [filas1 filas2 ...]
+
+TAMANOS = [int(x) for x in sys.argv[1:]] or [1_000, 50_000, 200_000]
+REPETICIONES = 3
+
+
+def crear_ventas(filas):
+    # Misma estructura que crear_sucursal() de generar_problema.py
+    return pd.DataFrame({
+        'Fecha': pd.Timestamp('2025-01-01') + pd.to_timedelta(np.random.randint(0, 365, filas), unit='D'),
+        'Producto': np.random.choice(['Laptop', 'Mouse', 'Teclado', 'Monitor'], filas),
+        'Vendedor': np.random.choice(['Ana', 'Carlos', 'Beatriz'], filas),
+        'Monto': np.random.randint(50, 1500, filas),
+        'Sucursal': 'Sucursal Benchmark',
+    })
+
+def medir(ruta, motor, columnas=None):
+    tiempos = []
+    for _ in range(REPETICIONES):
+        inicio = time.perf_counter()
+        lector_excel.leer_excel(ruta, columnas=columnas, motor=motor)
+        tiempos.append(time.perf_counter() - inicio)
+    return min(tiempos)
+
+
+print(f"🧪 Motores disponibles: {lector_excel.motores_disponibles()}")
+
+with tempfile.TemporaryDirectory() as carpeta:
+    for filas in TAMANOS:
+        ruta = os.path.join(carpeta, f"ventas_{filas}.xlsx")
+        crear_ventas(filas).to_excel(ruta, index=False, engine='xlsxwriter')
+        peso_mb = os.path.getsize(ruta) / 1e6
+
+        print(f"\n📄 {filas:,} filas ({peso_mb:.1f} MB)")
+        # Medimos primero openpyxl (el motor por defecto de pandas) para usarlo de referencia
+        base = None
+        for motor in reversed(lector_excel.motores_disponibles()):
+            for columnas in (None, ['Fecha', 'Monto']):
+                segundos = medir(ruta, motor, columnas)
+                base = base or segundos
+                etiqueta = "todas" if columnas is None else "Fecha+Monto"
+                print(f"   {motor:<10} {etiqueta:<12} {segundos:8.3f} s  "
+                      f"{filas / segundos:12,.0f} filas/s  x{base / segundos:.1f}")
@@ -0,0 +1,201 @@
+import os
+import json
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import motor_consolidador
+
+# --- COLA DE TRABAJOS EN SEGUNDO PLANO ---
+# La consolidación corre en un hilo aparte (que a su vez usa el pool de procesos del motor),
+# fuera del script de Streamlit: un rerun o un cambio de pestaña ya no la corta.
+# Cada trabajo tiene un id; el resultado queda en disco con ese id y la tabla de trabajos
+# se guarda en JSON, así la descarga sobrevive a reruns y a reinicios del servidor.
+
+DIR_TRABAJOS = os.path.join(".cache", "trabajos")
+
+# Estados posibles de un trabajo
+EN_COLA, PROCESANDO, TERMINADO, ERROR, INTERRUMPIDO = "en_cola", "procesando", "terminado", "error", "interrumpido"
+
+# Retención: los trabajos terminados se borran (archivo y entrada de la tabla) pasados estos
+# días, o antes si hay más de MAX_TRABAJOS_GUARDADOS (se conservan los más nuevos)
+RETENCION_DIAS = 7
+MAX_TRABAJOS_GUARDADOS = 50
+
+
+class _SumideroContador:
+    """Envuelve un sumidero para contar filas a medida que se escriben (progreso en vivo)."""
+
+    def __init__(self, sumidero, al_escribir):
+        self.sumidero = sumidero
+        self.al_escribir = al_escribir
+
+    def iniciar(self, esquema):
+        self.sumidero.iniciar(esquema)
+
+    def escribir(self, df):
+        self.sumidero.escribir(df)
+        self.al_escribir(len(df))
+
+    def cerrar(self):
+        self.sumidero.cerrar()
+
+    def __getattr__(self, nombre):
+        # Lo demás (ej. agregar_resumenes en Excel) pasa directo al sumidero real
+        return getattr(self.sumidero, nombre)
+
+
+class ColaTrabajos:
+    def __init__(self, dir_trabajos=DIR_TRABAJOS, max_simultaneos=2, retencion_dias=RETENCION_DIAS,
+                 max_guardados=MAX_TRABAJOS_GUARDADOS):
+        self.dir_trabajos = dir_trabajos
+        self.retencion_seg = retencion_dias * 24 * 3600
+        self.max_guardados = max_guardados
+        os.makedirs(dir_trabajos, exist_ok=True)
+        self._pool = ThreadPoolExecutor(max_workers=max_simultaneos, thread_name_prefix="consolidador")
+        # Repartimos los núcleos entre los trabajos que pueden correr a la vez
+        self._procesos_por_trabajo = max(1, (os.cpu_count() or 1) // max_simultaneos)
+        self._lock = threading.Lock()
+        self._lock_tabla = threading.Lock()  # la tabla se guarda desde la página y desde los hilos
+        self._trabajos = self._cargar_tabla()
+        self._purgar()
+
+    # --- API pública ---
+
+    def enviar(self, fuentes, formato='xlsx', dir_cache=None, deduplicar=False, en_disco=False):
+        """Encola la consolidación de `fuentes` y devuelve el id del trabajo al instante."""
+        id_trabajo = uuid.uuid4().hex[:12]
+        fuentes = list(fuentes)
+        self._purgar()
+        with self._lock:
+            self._trabajos[id_trabajo] = {
+                'id': id_trabajo, 'estado': EN_COLA, 'formato': formato,
+                'total': len(fuentes), 'hechos': 0, 'archivo_actual': None,
+                'filas': 0, 'duplicados': 0, 'creado': time.time(), 'inicio': None, 'fin': None,
+                'ruta_resultado': os.path.join(self.dir_trabajos, f"{id_trabajo}.{formato}"),
+                'errores': [], 'mensaje_error': None, 'vista_previa': None, 'resumenes': {},
+            }
+        # Guardado ya al encolar: si el servidor se reinicia antes de que termine, queda INTERRUMPIDO
+        self._guardar_tabla()
+        self._pool.submit(self._ejecutar, id_trabajo, fuentes, formato, dir_cache, deduplicar, en_disco)
+        return id_trabajo
+
+    def estado(self, id_trabajo):
+        """Copia del estado del trabajo (o None si no existe) con el throughput calculado."""
+        with self._lock:
+            trabajo = self._trabajos.get(id_trabajo)
+            if trabajo is None:
+                return None
+            trabajo = dict(trabajo)
+        if trabajo['inicio']:
+            segundos = (trabajo['fin'] or time.time()) - trabajo['inicio']
+            trabajo['segundos'] = segundos
+            trabajo['filas_por_seg'] = trabajo['filas'] / segundos if segundos > 0 else 0
+        return trabajo
+
+    def listar(self, ids, limite=10):
+        """Estados de los trabajos pedidos (los de una sesión), del más nuevo al más viejo."""
+        with self._lock:
+            ids = sorted((i for i in ids if i in self._trabajos),
+                         key=lambda i: self._trabajos[i]['creado'], reverse=True)
+        return [self.estado(i) for i in ids[:limite]]
+
+    def resultado(self, id_trabajo):
+        """Bytes del archivo generado, si el trabajo terminó bien."""
+        trabajo = self.estado(id_trabajo)
+        if not trabajo or trabajo['estado'] != TERMINADO or not os.path.exists(trabajo['ruta_resultado']):
+            return None
+        with open(trabajo['ruta_resultado'], 'rb') as f:
+            return f.read()
+
+    # --- Ejecución (hilo de fondo) ---
+
+    def _actualizar(self, id_trabajo, **campos):
+        with self._lock:
+            self._trabajos[id_trabajo].update(campos)
+
+    def _sumar_filas(self, id_trabajo, filas):
+        with self._lock:
+            self._trabajos[id_trabajo]['filas'] += filas
+
+    def _ejecutar(self, id_trabajo, fuentes, formato, dir_cache, deduplicar, en_disco):
+        self._actualizar(id_trabajo, estado=PROCESANDO, inicio=time.time())
+        self._guardar_tabla()
+        ruta = self._trabajos[id_trabajo]['ruta_resultado']
+        ruta_tmp = ruta + '.tmp'
+
+        def avanzar(hechos, total, nombre):
+            self._actualizar(id_trabajo, hechos=hechos, archivo_actual=nombre)
+
+        try:
+            with open(ruta_tmp, 'wb') as destino:
+                sumidero = _SumideroContador(
+                    motor_consolidador.SUMIDEROS[formato](destino),
+                    lambda filas: self._sumar_filas(id_trabajo, filas),
+                )
+                resumen = motor_consolidador.consolidar(
+                    fuentes, sumidero, max_workers=self._procesos_por_trabajo,
+                    al_avanzar=avanzar, dir_cache=dir_cache, deduplicar=deduplicar,
+                    en_disco=en_disco, dir_temporal=self.dir_trabajos,
+                )
+            os.replace(ruta_tmp, ruta)
+            self._actualizar(id_trabajo, estado=TERMINADO, fin=time.time(),
+                             errores=resumen['errores'], vista_previa=resumen['vista_previa'],
+                             resumenes=resumen['resumenes'], duplicados=resumen['duplicados'],
+                             archivos_ok=resumen['archivos'])
+        except Exception as e:
+            self._actualizar(id_trabajo, estado=ERROR, fin=time.time(), mensaje_error=str(e))
+            if os.path.exists(ruta_tmp):
+                os.remove(ruta_tmp)
+        self._guardar_tabla()
+
+    # --- Retención ---
+
+    def _purgar(self):
+        """Borra los trabajos terminados viejos o que exceden el máximo (los en curso nunca)."""
+        limite = time.time() - self.retencion_seg
+        with self._lock:
+            terminados = sorted((t for t in self._trabajos.values() if t['estado'] not in (EN_COLA, PROCESANDO)),
+                                key=lambda t: t['creado'], reverse=True)
+            viejos = [t for i, t in enumerate(terminados)
+                      if i >= self.max_guardados or (t['fin'] or t['creado']) < limite]
+            for trabajo in viejos:
+                del self._trabajos[trabajo['id']]  # con su vista previa y resúmenes en memoria
+        if not viejos:
+            return
+
+        for trabajo in viejos:
+            for ruta in (trabajo['ruta_resultado'], trabajo['ruta_resultado'] + '.tmp'):
+                if os.path.exists(ruta):
+                    os.remove(ruta)
+        self._guardar_tabla()
+
+    # --- Persistencia de la tabla de trabajos ---
+
+    def _ruta_tabla(self):
+        return os.path.join(self.dir_trabajos, 'trabajos.json')
+
+    def _cargar_tabla(self):
+        if not os.path.exists(self._ruta_tabla()):
+            return {}
+        with open(self._ruta_tabla(), encoding='utf-8') as f:
+            trabajos = json.load(f)
+        for trabajo in trabajos.values():
+            trabajo['vista_previa'] = None
+            trabajo['resumenes'] = {}
+            # Lo que estaba corriendo cuando se reinició el servidor no va a terminar solo
+            if trabajo['estado'] in (EN_COLA, PROCESANDO):
+                trabajo['estado'] = INTERRUMPIDO
+        return trabajos
+
+    def _guardar_tabla(self):
+        # Foto y escritura bajo el mismo lock: una foto vieja nunca pisa a una más nueva
+        with self._lock_tabla:
+            with self._lock:
+                # Vista previa y resúmenes son DataFrames: no van al JSON
+                tabla = {i: {k: v for k, v in t.items() if k not in ('vista_previa', 'resumenes')}
+                         for i, t in self._trabajos.items()}
+            ruta_tmp = self._ruta_tabla() + '.tmp'
+            with open(ruta_tmp, 'w', encoding='utf-8') as f:
+                json.dump(tabla, f, indent=2, default=str)
+            os.replace(ruta_tmp, self._ruta_tabla())
@@ -0,0 +1,153 @@
+import functools
+import numpy as np
+
+# --- DISTANCIAS HAVERSINE VECTORIZADAS ---
+# Todas las distancias de Estética Móvil (semáforo, mapa, rutas) salen de acá: en vez de
+# llamar una función escalar par por par, se calcula la matriz N x M completa con NumPy.
+# Las matrices se guardan en un caché chico con las coordenadas redondeadas como clave,
+# así los reruns de Streamlit con los mismos puntos no recalculan nada.
+
+RADIO_TIERRA_KM = 6371.0
+
+# 5 decimales de grado ~ 1 metro: más que suficiente para distancias de manejo
+DECIMALES_CACHE = 5
+TAMANO_CACHE = 128
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Distancia en km elemento a elemento (acepta escalares o arrays que se puedan combinar)."""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=float)) for v in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * RADIO_TIERRA_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+def _matriz(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = (np.asarray(v, dtype=float).ravel() for v in (lat1, lon1, lat2, lon2))
+    return haversine_km(lat1[:, None], lon1[:, None], lat2[None, :], lon2[None, :])
+
+@functools.lru_cache(maxsize=TAMANO_CACHE)
+def _matriz_cacheada(lat1, lon1, lat2, lon2):
+    matriz = _matriz(lat1, lon1, lat2, lon2)
+    matriz.setflags(write=False)  # la comparten todos los que piden los mismos puntos
+    return matriz
+
+def _clave(valores):
+    return tuple(np.round(np.asarray(valores, dtype=float).ravel(), DECIMALES_CACHE).tolist())
+
+def matriz_km(lat1, lon1, lat2, lon2, usar_cache=True):
+    """Matriz N x M de distancias (km) entre los puntos (lat1, lon1) y los (lat2, lon2).
+
+    Con usar_cache la matriz devuelta es de solo lectura (copiarla si se va a modificar).
+    """
+    if not usar_cache:
+        return _matriz(lat1, lon1, lat2, lon2)
+    return _matriz_cacheada(_clave(lat1), _clave(lon1), _clave(lat2), _clave(lon2))
+
+def matriz_cuadrada_km(lats, lons, usar_cache=True):
+    """Distancias de todos contra todos (ej. base + turnos del día)."""
+    return matriz_km(lats, lons, lats, lons, usar_cache)
+
+def distancia_km(lat1, lon1, lat2, lon2):
+    """Un solo par de puntos, como float (para mensajes y casos sueltos)."""
+    return float(haversine_km(lat1, lon1, lat2, lon2))
+
+def limpiar_cache():
+    _matriz_cacheada.cache_clear()
+
+
+# --- ÍNDICE ESPACIAL ---
+# Grilla de celdas de ~1 km sobre una proyección plana local (a escala de una ciudad el
+# error es despreciable). Una consulta solo mira las celdas que tocan el radio pedido y
+# después confirma con Haversine, así no se recorre toda la tabla de clientes o turnos.
+# No depende de scipy: con miles de puntos la grilla alcanza y sobra.
+
+KM_POR_GRADO_LAT = 110.57
+KM_POR_GRADO_LON_ECUADOR = 111.32
+
+class IndiceEspacial:
+    def __init__(self, lats, lons, celda_km=1.0):
+        self.lats = np.asarray(lats, dtype=float)
+        self.lons = np.asarray(lons, dtype=float)
+        self.celda_km = celda_km
+        validos = np.isfinite(self.lats) & np.isfinite(self.lons)
+        self._lat0 = float(np.mean(self.lats[validos])) if validos.any() else 0.0
+        self._cos0 = np.cos(np.radians(self._lat0))
+
+        # Puntos ordenados por celda: cada celda es un tramo contiguo [inicio, fin)
+        cx, cy = self._celda(self.lats[validos], self.lons[validos])
+        claves = cx * 1_000_003 + cy
+        orden = np.argsort(claves, kind="stable")
+        self._indices = np.flatnonzero(validos)[orden]
+        unicas, inicios, cantidades = np.unique(claves[orden], return_index=True, return_counts=True)
+        self._celdas = {int(c): (int(i), int(i + n)) for c, i, n in zip(unicas, inicios, cantidades)}
+
+    def __len__(self):
+        return len(self.lats)
+
+    def _plano(self, lats, lons):
+        # Proyección plana local (km): la misma de las celdas
+        return np.asarray(lons) * KM_POR_GRADO_LON_ECUADOR * self._cos0, np.asarray(lats) * KM_POR_GRADO_LAT
+
+    def _celda(self, lats, lons):
+        x, y = self._plano(lats, lons)
+        return np.floor(x / self.celda_km).astype(np.int64), np.floor(y / self.celda_km).astype(np.int64)
+
+    def _candidatos(self, lat, lon, radio_km):
+        cx, cy = self._celda(lat, lon)
+        alcance = int(np.ceil(radio_km / self.celda_km))
+        tramos = [self._celdas.get(int((cx + dx) * 1_000_003 + cy + dy))
+                  for dx in range(-alcance, alcance + 1) for dy in range(-alcance, alcance + 1)]
+        tramos = [t for t in tramos if t]
+        if not tramos:
+            return np.array([], dtype=np.int64)
+        return np.concatenate([self._indices[i:f] for i, f in tramos])
+
+    def cerca(self, lat, lon, radio_km):
+        """Puntos a menos de radio_km de (lat, lon): (índices, distancias), del más cercano al más lejano."""
+        candidatos = self._candidatos(lat, lon, radio_km)
+        dist = haversine_km(lat, lon, self.lats[candidatos], self.lons[candidatos])
+        dentro = dist <= radio_km
+        orden = np.argsort(dist[dentro], kind="stable")
+        return candidatos[dentro][orden], dist[dentro][orden]
+
+    def cerca_de_ruta(self, lats_ruta, lons_ruta, radio_km):
+        """Puntos a menos de radio_km de algún tramo de la ruta: (índices, distancia mínima a la ruta).
+
+        Los candidatos salen de muestrear cada tramo cada media celda; la distancia que
+        decide es la del punto al segmento, así un cliente a mitad de camino entre dos
+        muestras también aparece.
+        """
+        lats_ruta, lons_ruta = np.asarray(lats_ruta, dtype=float), np.asarray(lons_ruta, dtype=float)
+        paso = self.celda_km / 2
+        muestras_lat, muestras_lon = [lats_ruta[:1]], [lons_ruta[:1]]
+        for i in range(len(lats_ruta) - 1):
+            largo = distancia_km(lats_ruta[i], lons_ruta[i], lats_ruta[i + 1], lons_ruta[i + 1])
+            pasos = max(1, int(np.ceil(largo / paso)))
+            t = np.arange(1, pasos + 1) / pasos
+            muestras_lat.append(lats_ruta[i] + t * (lats_ruta[i + 1] - lats_ruta[i]))
+            muestras_lon.append(lons_ruta[i] + t * (lons_ruta[i + 1] - lons_ruta[i]))
+
+        # Ningún punto de un tramo queda a más de medio paso de una muestra: con el radio
+        # agrandado en eso, todo punto cerca del tramo está entre los candidatos
+        candidatos = [self._candidatos(lat, lon, radio_km + paso / 2)
+                      for lat, lon in zip(np.concatenate(muestras_lat), np.concatenate(muestras_lon))]
+        candidatos = np.unique(np.concatenate(candidatos)) if candidatos else np.array([], dtype=np.int64)
+        if not len(candidatos):
+            return candidatos, np.array([], dtype=float)
+
+        dist = self._distancia_a_ruta(candidatos, lats_ruta, lons_ruta)
+        dentro = dist <= radio_km
+        orden = np.argsort(dist[dentro], kind="stable")
+        return candidatos[dentro][orden], dist[dentro][orden]
+
+    def _distancia_a_ruta(self, indices, lats_ruta, lons_ruta):
+        """Distancia (km) de cada punto al segmento más cercano de la ruta, en el plano local."""
+        if len(lats_ruta) == 1:
+            return haversine_km(lats_ruta[0], lons_ruta[0], self.lats[indices], self.lons[indices])
+        px, py = self._plano(self.lats[indices], self.lons[indices])
+        x, y = self._plano(lats_ruta, lons_ruta)
+        ax, ay, dx, dy = x[:-1], y[:-1], np.diff(x), np.diff(y)
+        largo2 = dx ** 2 + dy ** 2
+        # Proyección de cada punto sobre cada tramo, recortada a sus extremos (puntos x tramos)
+        t = ((px[:, None] - ax) * dx + (py[:, None] - ay) * dy) / np.where(largo2 > 0, largo2, 1)
+        t = np.clip(t, 0, 1)
+        return np.hypot(px[:, None] - (ax + t * dx), py[:, None] - (ay + t * dy)).min(axis=1)
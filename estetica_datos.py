@@ -0,0 +1,387 @@
+import os
+import re
+import bisect
+import difflib
+import sqlite3
+import hashlib
+import unicodedata
+import contextlib
+import pandas as pd
+
+# --- CONSTANTES ---
+# La agenda y la base de clientes de Estética Móvil viven en SQLite (antes eran CSV que se
+# reescribían completos en cada turno). Con WAL varias personas pueden agendar a la vez:
+# las lecturas no bloquean a la escritura y cada alta es un INSERT, no un archivo nuevo.
+DB_ESTETICA = "estetica.db"
+
+# CSV de la versión anterior: se migran una sola vez, la primera vez que se abre la base
+FILE_CLIENTES = "clientes_db.csv"
+FILE_AGENDA = "agenda_db.csv"
+
+COLUMNAS_CLIENTES = ["Nombre", "Zona", "Contacto", "Notas Técnicas", "Direccion", "lat", "lon"]
+COLUMNAS_AGENDA = ["Fecha", "Hora", "Cliente", "Zona", "Servicio", "lat", "lon", "Estado", "Profesional"]
+COLUMNAS_PROFESIONALES = ["Nombre", "Zona", "lat", "lon"]
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS clientes (
+    id INTEGER PRIMARY KEY,
+    "Nombre" TEXT NOT NULL,
+    "Zona" TEXT,
+    "Contacto" TEXT,
+    "Notas Técnicas" TEXT,
+    "Direccion" TEXT,
+    "lat" REAL,
+    "lon" REAL
+);
+CREATE INDEX IF NOT EXISTS idx_clientes_nombre ON clientes ("Nombre");
+
+CREATE TABLE IF NOT EXISTS agenda (
+    id INTEGER PRIMARY KEY,
+    "Fecha" TEXT NOT NULL,   -- ISO (AAAA-MM-DD): ordena y compara bien como texto
+    "Hora" TEXT NOT NULL,    -- HH:MM
+    "Cliente" TEXT,
+    "Zona" TEXT,
+    "Servicio" TEXT,
+    "lat" REAL,
+    "lon" REAL,
+    "Estado" TEXT,
+    "Profesional" TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_agenda_fecha_hora ON agenda ("Fecha", "Hora");
+
+-- Equipo: cada profesional sale de su propia base
+CREATE TABLE IF NOT EXISTS profesionales (
+    id INTEGER PRIMARY KEY,
+    "Nombre" TEXT NOT NULL UNIQUE,
+    "Zona" TEXT,
+    "lat" REAL,
+    "lon" REAL
+);
+
+-- Cambios que no son altas (ej. reasignar turnos): suman a la versión de la tabla
+CREATE TABLE IF NOT EXISTS revisiones (
+    tabla TEXT PRIMARY KEY,
+    n INTEGER NOT NULL
+);
+
+-- Caché de geocodificación: cada dirección (normalizada) se resuelve una sola vez
+CREATE TABLE IF NOT EXISTS geocache (
+    direccion TEXT PRIMARY KEY,
+    lat REAL,
+    lon REAL,
+    fuente TEXT
+);
+"""
+
+# Columnas que se agregaron después de la primera versión de la base
+_COLUMNAS_NUEVAS = {"clientes": {"Direccion": "TEXT", "lat": "REAL", "lon": "REAL"},
+                    "agenda": {"Profesional": "TEXT"}}
+
+
+# --- CONEXIÓN ---
+
+@contextlib.contextmanager
+def conexion(ruta=DB_ESTETICA):
+    """Conexión corta por operación (Streamlit corre cada rerun en un hilo distinto).
+
+    Confirma al salir sin errores y revierte si algo falla.
+    """
+    conn = sqlite3.connect(ruta, timeout=10)
+    try:
+        conn.execute("PRAGMA busy_timeout = 10000")
+        yield conn
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+def inicializar(ruta=DB_ESTETICA, file_clientes=FILE_CLIENTES, file_agenda=FILE_AGENDA):
+    """Crea tablas e índices, activa WAL y migra los CSV viejos si la base está vacía."""
+    with conexion(ruta) as conn:
+        conn.execute("PRAGMA journal_mode = WAL")  # queda grabado en el archivo de la base
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.executescript(_ESQUEMA)
+        _agregar_columnas(conn)
+    migradas = migrar_csv(ruta, file_clientes, file_agenda)
+    completar_coordenadas(ruta)
+    return migradas
+
+def _agregar_columnas(conn):
+    for tabla, columnas in _COLUMNAS_NUEVAS.items():
+        existentes = {fila[1] for fila in conn.execute(f"PRAGMA table_info({tabla})")}
+        for columna, tipo in columnas.items():
+            if columna not in existentes:
+                conn.execute(f'ALTER TABLE {tabla} ADD COLUMN "{columna}" {tipo}')
+
+def migrar_csv(ruta=DB_ESTETICA, file_clientes=FILE_CLIENTES, file_agenda=FILE_AGENDA):
+    """Copia los CSV a la base, solo en las tablas que todavía están vacías.
+
+    Devuelve cuántas filas se migraron de cada uno. Los CSV quedan como respaldo.
+    """
+    migradas = {}
+    with conexion(ruta) as conn:
+        for tabla, archivo, columnas in (("clientes", file_clientes, COLUMNAS_CLIENTES),
+                                         ("agenda", file_agenda, COLUMNAS_AGENDA)):
+            vacia = conn.execute(f"SELECT NOT EXISTS (SELECT 1 FROM {tabla})").fetchone()[0]
+            if not vacia or not os.path.exists(archivo):
+                continue
+            df = pd.read_csv(archivo, dtype={"Fecha": str, "Hora": str})
+            df = df.reindex(columns=columnas)
+            _insertar(conn, tabla, df.astype(object).where(df.notna(), None).itertuples(index=False))
+            migradas[tabla] = len(df)
+    return migradas
+
+
+# --- ESCRITURA (solo altas: nunca se reescribe la tabla) ---
+
+def _insertar(conn, tabla, filas):
+    columnas = {"clientes": COLUMNAS_CLIENTES, "agenda": COLUMNAS_AGENDA,
+                "profesionales": COLUMNAS_PROFESIONALES}[tabla]
+    nombres = ", ".join(f'"{c}"' for c in columnas)
+    marcas = ", ".join("?" * len(columnas))
+    conn.executemany(f"INSERT INTO {tabla} ({nombres}) VALUES ({marcas})", filas)
+
+def agregar_cliente(cliente, ruta=DB_ESTETICA, geocodificador=None):
+    """Alta de un cliente: sus coordenadas se resuelven una vez y quedan guardadas."""
+    importar_clientes(pd.DataFrame([cliente]), ruta, geocodificador)
+
+def importar_clientes(df, ruta=DB_ESTETICA, geocodificador=None):
+    """Alta masiva (ej. una planilla): todas las direcciones se geocodifican en un solo lote."""
+    df = df.reindex(columns=COLUMNAS_CLIENTES)
+    faltan = df["lat"].isna() | df["lon"].isna()
+    if faltan.any():
+        coords = geocodificar(direccion_de(df[faltan]), ruta, geocodificador)
+        df.loc[faltan, "lat"] = [c[0] if c else float("nan") for c in coords]
+        df.loc[faltan, "lon"] = [c[1] if c else float("nan") for c in coords]
+    with conexion(ruta) as conn:
+        _insertar(conn, "clientes", df.astype(object).where(df.notna(), None).itertuples(index=False))
+    return len(df)
+
+def agregar_turno(turno, ruta=DB_ESTETICA):
+    with conexion(ruta) as conn:
+        _insertar(conn, "agenda", [tuple(turno.get(c) for c in COLUMNAS_AGENDA)])
+
+def agregar_profesional(nombre, zona, ruta=DB_ESTETICA):
+    lat, lon = BARRIOS.get(zona, CENTRO_CIUDAD)
+    with conexion(ruta) as conn:
+        _insertar(conn, "profesionales", [(nombre, zona, lat, lon)])
+
+def asignar_turnos(asignacion, ruta=DB_ESTETICA):
+    """Guarda qué profesional hace cada turno. asignacion: DataFrame con id y Profesional.
+
+    Es la única escritura que modifica filas: suma una revisión para invalidar cachés.
+    """
+    with conexion(ruta) as conn:
+        conn.executemany('UPDATE agenda SET "Profesional" = ? WHERE id = ?',
+                         [(p, int(i)) for i, p in zip(asignacion["id"], asignacion["Profesional"])])
+        conn.execute("INSERT INTO revisiones (tabla, n) VALUES ('agenda', 1) "
+                     "ON CONFLICT(tabla) DO UPDATE SET n = n + 1")
+
+
+# --- LECTURA ---
+
+def cargar_clientes(ruta=DB_ESTETICA):
+    with conexion(ruta) as conn:
+        nombres = ", ".join(f'"{c}"' for c in COLUMNAS_CLIENTES)
+        return pd.read_sql_query(f"SELECT {nombres} FROM clientes ORDER BY id", conn)
+
+def agenda_entre(desde, hasta, ruta=DB_ESTETICA):
+    """Turnos con Fecha entre desde y hasta (inclusive), ordenados por fecha y hora (con su id).
+
+    Usa el índice (Fecha, Hora): solo se leen los días pedidos, no toda la historia.
+    """
+    with conexion(ruta) as conn:
+        nombres = ", ".join(f'"{c}"' for c in COLUMNAS_AGENDA)
+        return pd.read_sql_query(
+            f'SELECT id, {nombres} FROM agenda WHERE "Fecha" BETWEEN ? AND ? ORDER BY "Fecha", "Hora"',
+            conn, params=(str(desde), str(hasta)))
+
+def agenda_del_dia(fecha, ruta=DB_ESTETICA):
+    return agenda_entre(fecha, fecha, ruta)
+
+def cargar_profesionales(ruta=DB_ESTETICA):
+    with conexion(ruta) as conn:
+        nombres = ", ".join(f'"{c}"' for c in COLUMNAS_PROFESIONALES)
+        return pd.read_sql_query(f"SELECT {nombres} FROM profesionales ORDER BY id", conn)
+
+def version(ruta=DB_ESTETICA):
+    """Versión de (clientes, agenda, profesionales): último id de cada tabla más sus revisiones.
+
+    Sirve de clave para los cachés de la página (cambia con cada alta o reasignación).
+    """
+    with conexion(ruta) as conn:
+        return tuple(
+            conn.execute(f"SELECT (SELECT IFNULL(MAX(id), 0) FROM {tabla}), "
+                         f"(SELECT IFNULL(MAX(n), 0) FROM revisiones WHERE tabla = '{tabla}')").fetchone()
+            for tabla in ("clientes", "agenda", "profesionales"))
+
+
+# --- GEOCODIFICACIÓN ---
+# Antes cada turno inventaba una posición con ruido aleatorio alrededor del centro del
+# barrio, así el mismo cliente caía en un punto distinto cada vez. Ahora cada cliente tiene
+# coordenadas fijas: su dirección se normaliza, se busca en el caché (tabla geocache) y solo
+# las que faltan van al geocodificador, todas juntas. El geocodificador es intercambiable:
+# cualquier objeto con nombre y geocodificar_lote(direcciones) -> lista de (lat, lon) o None.
+
+# Nomenclátor local: centro aproximado de cada barrio de Montevideo
+BARRIOS = {
+    "Pocitos": [-34.908, -56.145],
+    "Carrasco": [-34.885, -56.058],
+    "Centro": [-34.905, -56.190],
+    "Malvín": [-34.895, -56.110],
+    "Punta Carretas": [-34.920, -56.160],
+    "Cordón": [-34.900, -56.170],
+    "Prado": [-34.855, -56.200],
+    "Buceo": [-34.900, -56.130],
+    "Ciudad Vieja": [-34.907, -56.205],
+    "Parque Batlle": [-34.895, -56.155],
+    "Tres Cruces": [-34.892, -56.165],
+    "Punta Gorda": [-34.890, -56.090],
+    "La Blanqueada": [-34.880, -56.150]
+}
+CENTRO_CIUDAD = [-34.90, -56.16]
+
+def normalizar_texto(texto):
+    """Texto comparable (clave del geocaché y de búsquedas): sin tildes, en minúsculas,
+    sin puntuación ni espacios repetidos."""
+    texto = unicodedata.normalize("NFKD", str(texto or "")).encode("ascii", "ignore").decode()
+    texto = re.sub(r"[^a-z0-9]+", " ", texto.casefold())
+    return " ".join(texto.split())
+
+def direccion_de(df):
+    """Texto a geocodificar por cliente: su dirección y barrio, o nombre y barrio si no hay dirección."""
+    direccion = df["Direccion"].astype("string").fillna("").str.strip()
+    respaldo = df["Nombre"].astype("string").fillna("")
+    base = direccion.where(direccion != "", respaldo)
+    return (base + ", " + df["Zona"].astype("string").fillna("")).tolist()
+
+
+class GeocodificadorNomenclator:
+    """Geocodificador sin conexión: ubica la dirección dentro del barrio que menciona.
+
+    El desplazamiento dentro del barrio sale de un hash de la dirección, así es estable
+    (la misma dirección siempre da el mismo punto) y los vecinos no se superponen.
+    """
+    nombre = "nomenclator"
+
+    def __init__(self, barrios=BARRIOS, dispersion=0.004):
+        self.barrios = {normalizar_texto(b): c for b, c in barrios.items()}
+        self.dispersion = dispersion
+
+    def geocodificar_lote(self, direcciones):
+        resultado = []
+        for direccion in direcciones:
+            clave = normalizar_texto(direccion)
+            # El barrio más largo que aparezca gana ('punta carretas' antes que 'centro')
+            barrios = [b for b in sorted(self.barrios, key=len, reverse=True) if f" {b} " in f" {clave} "]
+            if not barrios:
+                resultado.append(None)
+                continue
+            lat, lon = self.barrios[barrios[0]]
+            semilla = hashlib.blake2b(clave.encode(), digest_size=8).digest()
+            dlat = (int.from_bytes(semilla[:4], "big") / 2**32 - 0.5) * self.dispersion
+            dlon = (int.from_bytes(semilla[4:], "big") / 2**32 - 0.5) * self.dispersion
+            resultado.append((lat + dlat, lon + dlon))
+        return resultado
+
+
+def geocodificar(direcciones, ruta=DB_ESTETICA, geocodificador=None):
+    """Coordenadas (lat, lon) o None por dirección, usando el caché persistente.
+
+    Las direcciones repetidas o ya vistas no llegan al geocodificador.
+    """
+    geocodificador = geocodificador or GeocodificadorNomenclator()
+    claves = [normalizar_texto(d) for d in direcciones]
+    unicas = list(dict.fromkeys(claves))
+
+    conocidas = {}
+    with conexion(ruta) as conn:
+        for i in range(0, len(unicas), 500):  # límite de parámetros de SQLite
+            bloque = unicas[i:i + 500]
+            marcas = ", ".join("?" * len(bloque))
+            for clave, lat, lon in conn.execute(
+                    f"SELECT direccion, lat, lon FROM geocache WHERE direccion IN ({marcas})", bloque):
+                conocidas[clave] = (lat, lon) if lat is not None else None
+
+    faltan = [c for c in unicas if c not in conocidas]
+    if faltan:
+        originales = {}
+        for clave, direccion in zip(claves, direcciones):
+            originales.setdefault(clave, direccion)
+        nuevas = geocodificador.geocodificar_lote([originales[c] for c in faltan])
+        with conexion(ruta) as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO geocache (direccion, lat, lon, fuente) VALUES (?, ?, ?, ?)",
+                [(c, *(coords or (None, None)), geocodificador.nombre) for c, coords in zip(faltan, nuevas)])
+        conocidas.update(zip(faltan, nuevas))
+
+    return [conocidas[c] for c in claves]
+
+def completar_coordenadas(ruta=DB_ESTETICA, geocodificador=None):
+    """Geocodifica en lote a los clientes que todavía no tienen coordenadas (ej. los migrados)."""
+    with conexion(ruta) as conn:
+        pendientes = pd.read_sql_query(
+            'SELECT id, "Nombre", "Zona", "Direccion" FROM clientes WHERE lat IS NULL OR lon IS NULL', conn)
+    if pendientes.empty:
+        return 0
+    coords = geocodificar(direccion_de(pendientes), ruta, geocodificador)
+    filas = [(c[0], c[1], i) for i, c in zip(pendientes["id"], coords) if c]
+    with conexion(ruta) as conn:
+        conn.executemany("UPDATE clientes SET lat = ?, lon = ? WHERE id = ?", filas)
+    return len(filas)
+
+
+# --- ÍNDICE DE CLIENTES ---
+# El selector "¿Quién llama?" hacía unique() y filtros por nombre sobre toda la tabla en
+# cada rerun. El índice se arma una vez por versión de la base (la página lo cachea):
+# nombre -> fila en O(1), búsqueda por prefijo (del nombre o de cualquier palabra) con
+# bisect sobre claves ordenadas y, si no alcanza, coincidencias aproximadas con difflib.
+
+class IndiceClientes:
+    def __init__(self, df_clientes):
+        self.df = df_clientes.reset_index(drop=True)
+        self._filas = {}
+        for pos, nombre in enumerate(self.df["Nombre"]):
+            self._filas.setdefault(nombre, pos)  # con nombres repetidos vale el primero
+        self.nombres = list(self._filas)
+
+        # (clave, nombre) ordenadas: el nombre completo y cada palabra del nombre
+        self._claves = sorted({(palabra, nombre) for nombre in self.nombres
+                               for clave in [normalizar_texto(nombre)]
+                               for palabra in [clave] + clave.split()})
+        self._solo_claves = [c for c, _ in self._claves]
+        self._por_clave = {}
+        for clave, nombre in self._claves:
+            self._por_clave.setdefault(clave, []).append(nombre)
+
+    def __len__(self):
+        return len(self.nombres)
+
+    def fila(self, nombre):
+        """Datos del cliente como dict (None si no existe)."""
+        pos = self._filas.get(nombre)
+        return None if pos is None else self.df.iloc[pos].to_dict()
+
+    def buscar(self, texto, limite=20):
+        """Nombres que empiezan con el texto (o que tienen una palabra que empieza con él);
+        si hay pocos, se completan con los más parecidos."""
+        texto = normalizar_texto(texto)
+        if not texto:
+            return self.nombres[:limite]
+
+        encontrados = []
+        i = bisect.bisect_left(self._solo_claves, texto)
+        while i < len(self._claves) and self._solo_claves[i].startswith(texto) and len(encontrados) < limite:
+            nombre = self._claves[i][1]
+            if nombre not in encontrados:
+                encontrados.append(nombre)
+            i += 1
+
+        if len(encontrados) < limite:
+            for clave in difflib.get_close_matches(texto, self._por_clave, n=limite, cutoff=0.6):
+                for nombre in self._por_clave[clave]:
+                    if nombre not in encontrados and len(encontrados) < limite:
+                        encontrados.append(nombre)
+        return encontrados
@@ -0,0 +1,359 @@
+import time
+import numpy as np
+import pandas as pd
+import distancias
+
+# --- CONSTANTES ---
+# Supuestos de la jornada para armar horarios (ciudad, auto/moto)
+VELOCIDAD_KMH = 25          # velocidad media puerta a puerta
+DURACION_TURNO_MIN = 45     # lo que dura cada servicio
+VENTANA_MIN = 60            # se puede llegar hasta una hora antes o después de la Hora pactada
+
+# Tope de la búsqueda local: la página recalcula la ruta en cada alta de turno
+TIEMPO_MAX_MEJORA_SEG = 1.5
+
+
+# --- OPTIMIZACIÓN DE RUTA ---
+# La ruta sale de la base (índice 0 de la matriz) y visita todos los turnos del día, sin
+# volver. Cada turno tiene una ventana [Hora - VENTANA_MIN, Hora + VENTANA_MIN]: si se
+# llega antes se espera, si se llega después suma retraso. Un orden es mejor que otro si
+# tiene menos retraso y, a igual retraso, menos km. Con 10-20 visitas la búsqueda local
+# (vecino más cercano + 2-opt + Or-opt) converge en milisegundos; con días de 40 o más
+# visitas corta al llegar a TIEMPO_MAX_MEJORA_SEG y se queda con el mejor orden hallado.
+
+def hora_a_minutos(hora):
+    h, m = str(hora)[:5].split(":")
+    return int(h) * 60 + int(m)
+
+def minutos_a_hora(minutos):
+    minutos = int(round(minutos)) % (24 * 60)
+    return f"{minutos // 60:02d}:{minutos % 60:02d}"
+
+def simular(orden, matriz, horas, base=0):
+    """Recorre un orden de visitas: devuelve (retraso_total_min, km, llegadas).
+
+    orden son nodos de la matriz (base es el nodo de salida) y horas la hora pactada de
+    cada nodo en minutos. Se sale de la base justo a tiempo para llegar al inicio de la
+    ventana del primer turno.
+    """
+    if not orden:
+        return 0.0, 0.0, []
+    km = matriz[base, orden[0]] + sum(matriz[a, b] for a, b in zip(orden, orden[1:]))
+    minutos_por_km = 60 / VELOCIDAD_KMH
+
+    llegadas, retraso = [], 0.0
+    reloj = horas[orden[0]] - VENTANA_MIN
+    previo = None
+    for visita in orden:
+        if previo is not None:
+            reloj += DURACION_TURNO_MIN + matriz[previo, visita] * minutos_por_km
+        inicio, fin = horas[visita] - VENTANA_MIN, horas[visita] + VENTANA_MIN
+        reloj = max(reloj, inicio)
+        retraso += max(0.0, reloj - fin)
+        llegadas.append(reloj)
+        previo = visita
+    return retraso, km, llegadas
+
+def _costo(orden, matriz, horas):
+    retraso, km, _ = simular(orden, matriz, horas)
+    return (round(retraso, 6), km)
+
+def vecino_mas_cercano(matriz):
+    """Orden inicial: desde la base, siempre al turno más cercano todavía no visitado."""
+    n = len(matriz)
+    pendientes = set(range(1, n))
+    orden, actual = [], 0
+    while pendientes:
+        actual = min(pendientes, key=lambda j: matriz[actual, j])
+        orden.append(actual)
+        pendientes.remove(actual)
+    return orden
+
+def mejorar(orden, matriz, horas, tiempo_max=TIEMPO_MAX_MEJORA_SEG):
+    """Búsqueda local: 2-opt (invertir tramos) y Or-opt (mover tramos de 1 a 3 visitas).
+
+    Pasados tiempo_max segundos devuelve el mejor orden encontrado hasta ese momento.
+    """
+    limite = time.perf_counter() + tiempo_max
+    orden = list(orden)
+    mejor = _costo(orden, matriz, horas)
+    hubo_mejora = True
+    while hubo_mejora and time.perf_counter() < limite:
+        hubo_mejora = False
+        n = len(orden)
+        # 2-opt
+        for i in range(n - 1):
+            if time.perf_counter() > limite:
+                return orden
+            for j in range(i + 1, n):
+                candidato = orden[:i] + orden[i:j + 1][::-1] + orden[j + 1:]
+                costo = _costo(candidato, matriz, horas)
+                if costo < mejor:
+                    orden, mejor, hubo_mejora = candidato, costo, True
+        # Or-opt
+        for largo in (1, 2, 3):
+            for i in range(n - largo + 1):
+                if time.perf_counter() > limite:
+                    return orden
+                tramo = orden[i:i + largo]
+                resto = orden[:i] + orden[i + largo:]
+                for k in range(len(resto) + 1):
+                    if k == i:
+                        continue
+                    candidato = resto[:k] + tramo + resto[k:]
+                    costo = _costo(candidato, matriz, horas)
+                    if costo < mejor:
+                        orden, mejor, hubo_mejora = candidato, costo, True
+                        break
+    return orden
+
+def optimizar_ruta(ruta_del_dia, lat_base, lon_base, tiempo_max=TIEMPO_MAX_MEJORA_SEG):
+    """Orden de visita casi óptimo para los turnos del día (DataFrame con Hora, lat, lon).
+
+    Devuelve un dict con el orden (posiciones en ruta_del_dia), los km del orden por hora
+    y del optimizado, el retraso total y la hora estimada de llegada a cada turno.
+    """
+    lats = np.r_[lat_base, ruta_del_dia["lat"].to_numpy(dtype=float)]
+    lons = np.r_[lon_base, ruta_del_dia["lon"].to_numpy(dtype=float)]
+    matriz = distancias.matriz_cuadrada_km(lats, lons)
+    horas = np.r_[np.nan, [hora_a_minutos(h) for h in ruta_del_dia["Hora"]]]
+
+    # Partimos del orden por hora y del vecino más cercano (mitad del tiempo para cada uno)
+    # y nos quedamos con el mejor
+    por_hora = [int(i) + 1 for i in np.argsort(horas[1:], kind="stable")]
+    candidatos = [mejorar(inicio, matriz, horas, tiempo_max / 2) for inicio in (por_hora, vecino_mas_cercano(matriz))]
+    orden = min(candidatos, key=lambda o: _costo(o, matriz, horas))
+
+    _, km_original, _ = simular(por_hora, matriz, horas)
+    retraso, km_optimo, llegadas = simular(orden, matriz, horas)
+    return {
+        "orden": [v - 1 for v in orden],
+        "km_original": float(km_original),
+        "km_optimo": float(km_optimo),
+        "km_ahorrados": float(km_original - km_optimo),
+        "retraso_min": float(retraso),
+        "llegadas": [minutos_a_hora(m) for m in llegadas],
+    }
+
+
+# --- BÚSQUEDA DE HORARIOS ---
+# Cuando llama un cliente, en vez de probar horarios de a uno se evalúan todos los huecos
+# libres de la jornada (de uno o varios días) de una vez. El costo de un hueco es cuánto
+# se alarga la ruta al meter al cliente entre el turno anterior y el siguiente:
+#   d(anterior, cliente) + d(cliente, siguiente) - d(anterior, siguiente)
+# Si no hay turno anterior, se sale de la base; si no hay siguiente, no se descuenta nada.
+
+JORNADA_INICIO = "09:00"
+JORNADA_FIN = "19:00"
+PASO_MIN = 30
+
+def _horarios_jornada():
+    inicio, fin = hora_a_minutos(JORNADA_INICIO), hora_a_minutos(JORNADA_FIN)
+    return np.arange(inicio, fin + 1, PASO_MIN, dtype=float)
+
+def costos_insercion(agenda_dia, lat_cliente, lon_cliente, lat_base, lon_base):
+    """Costo (km extra) de cada horario libre de un día. Devuelve un DataFrame ordenado por hora.
+
+    Hueco es la posición del turno anterior en la agenda del día (0 = sale de la base).
+    """
+    horarios = _horarios_jornada()
+    agenda_dia = agenda_dia.sort_values("Hora")
+    horas = np.array([hora_a_minutos(h) for h in agenda_dia["Hora"]], dtype=float)
+
+    # Libre: a más de un servicio de distancia de cualquier turno tomado
+    if len(horas):
+        libre = (np.abs(horarios[:, None] - horas[None, :]) >= DURACION_TURNO_MIN).all(axis=1)
+        horarios = horarios[libre]
+
+    # Puntos: 0 = base, 1..n = turnos del día. Distancias del cliente a todos y entre vecinos
+    lats = np.r_[lat_base, agenda_dia["lat"].to_numpy(dtype=float)]
+    lons = np.r_[lon_base, agenda_dia["lon"].to_numpy(dtype=float)]
+    al_cliente = distancias.matriz_km([lat_cliente], [lon_cliente], lats, lons)[0]
+    entre_vecinos = distancias.haversine_km(lats[:-1], lons[:-1], lats[1:], lons[1:])  # i -> i+1
+
+    # Anterior de cada horario = cantidad de turnos antes (0 = base); siguiente = el que sigue
+    anterior = np.searchsorted(horas, horarios, side="right")
+    hay_siguiente = anterior < len(horas)
+    siguiente = np.minimum(anterior + 1, len(lats) - 1)
+    costo = al_cliente[anterior]
+    if len(horas):
+        tramo = entre_vecinos[np.minimum(anterior, len(horas) - 1)]  # anterior -> siguiente
+        costo = costo + np.where(hay_siguiente, al_cliente[siguiente] - tramo, 0.0)
+
+    nombres = np.array(["Base"] + agenda_dia["Cliente"].astype(str).tolist(), dtype=object)
+    return pd.DataFrame({
+        "Hora": [minutos_a_hora(m) for m in horarios],
+        "Km Extra": costo.round(1),
+        "Después de": nombres[anterior],
+        "Antes de": np.where(hay_siguiente, nombres[siguiente], "—"),
+        "Hueco": anterior,
+    })
+
+def mejores_horarios(agenda, fechas, lat_cliente, lon_cliente, lat_base, lon_base, limite=10):
+    """Ranking de horarios libres en las fechas dadas (agenda con columna Fecha ISO), de menor a mayor costo.
+
+    Se propone un horario por hueco (el primero libre entre dos turnos).
+    """
+    por_dia = dict(tuple(agenda.groupby("Fecha"))) if not agenda.empty else {}
+    tablas = []
+    for fecha in fechas:
+        agenda_dia = por_dia.get(str(fecha), agenda.iloc[0:0])
+        tabla = costos_insercion(agenda_dia, lat_cliente, lon_cliente, lat_base, lon_base)
+        tablas.append(tabla.assign(Fecha=str(fecha)))
+    if not tablas:
+        return pd.DataFrame(columns=["Fecha", "Hora", "Km Extra", "Después de", "Antes de"])
+    ranking = pd.concat(tablas, ignore_index=True)
+    # Dentro de un mismo hueco todos los horarios cuestan lo mismo: mostramos el primero.
+    # Por posición y no por nombres: la misma clienta dos veces en el día son dos huecos distintos
+    ranking = ranking.drop_duplicates(["Fecha", "Hueco"])
+    ranking = ranking.sort_values(["Km Extra", "Fecha", "Hora"], kind="stable").head(limite)
+    return ranking[["Fecha", "Hora", "Km Extra", "Después de", "Antes de"]].reset_index(drop=True)
+
+
+# --- EQUIPO (varias profesionales) ---
+# Cada profesional sale de su propia base. Repartir los turnos del día es un problema de
+# ruteo de vehículos con ventanas horarias (VRPTW); lo resolvemos con una heurística:
+#   1. Construcción: en orden de hora, cada turno va a la profesional que llega a tiempo
+#      con menos km desde su último turno.
+#   2. Mejora: se prueban mover un turno a otra profesional y cambiar dos turnos de hora
+#      parecida entre profesionales; se acepta si baja el retraso o, a igual retraso, los km.
+# Cada ruta se mantiene en orden de hora (los turnos tienen hora pactada), así evaluar un
+# movimiento es recorrer solo las dos rutas que cambian. La matriz de distancias sale del
+# caché de distancias.py. Con unos cientos de turnos termina en un par de segundos (hay un
+# tope de tiempo para la fase de mejora, el mismo TIEMPO_MAX_MEJORA_SEG de la ruta individual).
+
+def _insertar_por_hora(ruta, nodo, horas):
+    """Copia de la ruta con el nodo en su lugar según la hora pactada."""
+    pos = int(np.searchsorted(horas[ruta], horas[nodo], side="right")) if ruta else 0
+    return ruta[:pos] + [nodo] + ruta[pos:]
+
+def _nodos_equipo(agenda_dia, profesionales):
+    """Matriz y horas de los nodos: primero las bases (0..k-1), después los turnos (k..k+n-1)."""
+    lats = np.r_[profesionales["lat"].to_numpy(dtype=float), agenda_dia["lat"].to_numpy(dtype=float)]
+    lons = np.r_[profesionales["lon"].to_numpy(dtype=float), agenda_dia["lon"].to_numpy(dtype=float)]
+    horas = np.r_[np.full(len(profesionales), np.nan), [hora_a_minutos(h) for h in agenda_dia["Hora"]]]
+    return distancias.matriz_cuadrada_km(lats, lons), horas
+
+def _construir(k, visitas, matriz, horas):
+    minutos_por_km = 60 / VELOCIDAD_KMH
+    rutas = [[] for _ in range(k)]
+    ultimo = np.arange(k)                 # nodo donde está cada profesional
+    libre = np.full(k, -np.inf)           # minuto en que termina su último turno
+    for v in sorted(visitas, key=lambda n: horas[n]):
+        km = matriz[ultimo, v]
+        llegada = np.maximum(libre + km * minutos_por_km, horas[v] - VENTANA_MIN)
+        retraso = np.maximum(0.0, llegada - (horas[v] + VENTANA_MIN))
+        elegida = int(np.lexsort((km, retraso))[0])  # primero sin retraso, después menos km
+        rutas[elegida].append(v)
+        ultimo[elegida] = v
+        libre[elegida] = llegada[elegida] + DURACION_TURNO_MIN
+    return rutas
+
+def _mejorar_equipo(rutas, matriz, horas, tiempo_max):
+    limite = time.perf_counter() + tiempo_max
+    costos = [simular(r, matriz, horas, base=b)[:2] for b, r in enumerate(rutas)]
+
+    def probar(a, b, nueva_a, nueva_b):
+        costo_a = simular(nueva_a, matriz, horas, base=a)[:2]
+        costo_b = simular(nueva_b, matriz, horas, base=b)[:2]
+        retraso_antes, km_antes = costos[a][0] + costos[b][0], costos[a][1] + costos[b][1]
+        retraso, km = costo_a[0] + costo_b[0], costo_a[1] + costo_b[1]
+        if retraso < retraso_antes - 1e-6 or (retraso <= retraso_antes + 1e-6 and km < km_antes - 1e-6):
+            rutas[a], rutas[b] = nueva_a, nueva_b
+            costos[a], costos[b] = costo_a, costo_b
+            return True
+        return False
+
+    hubo_mejora = True
+    while hubo_mejora and time.perf_counter() < limite:
+        hubo_mejora = False
+        for a in range(len(rutas)):
+            for v in list(rutas[a]):
+                if time.perf_counter() > limite:
+                    return rutas
+                sin_v = [n for n in rutas[a] if n != v]
+                for b in range(len(rutas)):
+                    if b == a:
+                        continue
+                    # Mover v a la ruta b
+                    if probar(a, b, sin_v, _insertar_por_hora(rutas[b], v, horas)):
+                        hubo_mejora = True
+                        break
+                    # Intercambiar v con un turno de b a menos de una ventana de distancia
+                    cambiado = False
+                    for w in rutas[b]:
+                        if abs(horas[w] - horas[v]) > VENTANA_MIN:
+                            continue
+                        nueva_a = _insertar_por_hora(sin_v, w, horas)
+                        nueva_b = _insertar_por_hora([n for n in rutas[b] if n != w], v, horas)
+                        if probar(a, b, nueva_a, nueva_b):
+                            hubo_mejora = cambiado = True
+                            break
+                    if cambiado:
+                        break
+    return rutas
+
+def planificar_equipo(agenda_dia, profesionales, tiempo_max=TIEMPO_MAX_MEJORA_SEG):
+    """Reparte los turnos del día entre las profesionales (DataFrame con Nombre, lat, lon).
+
+    Devuelve un dict con la agenda asignada (columnas Profesional y Llegada), un resumen
+    por profesional y los km totales; si la agenda ya traía asignación completa, también
+    los km de esa asignación para comparar.
+    """
+    agenda_dia = agenda_dia.reset_index(drop=True)
+    profesionales = profesionales.reset_index(drop=True)
+    k = len(profesionales)
+    matriz, horas = _nodos_equipo(agenda_dia, profesionales)
+    visitas = list(range(k, k + len(agenda_dia)))
+
+    rutas = _mejorar_equipo(_construir(k, visitas, matriz, horas), matriz, horas, tiempo_max)
+
+    asignada = agenda_dia.copy()
+    # Columnas de texto desde el arranque: si la primera profesional queda sin turnos, pandas
+    # no puede inferir un float vacío y después rechazar los "HH:MM" de la siguiente
+    asignada["Profesional"] = pd.Series(asignada.get("Profesional"), index=asignada.index, dtype=object)
+    asignada["Llegada"] = pd.Series(index=asignada.index, dtype=object)
+    filas_resumen = []
+    for b, ruta in enumerate(rutas):
+        retraso, km, llegadas = simular(ruta, matriz, horas, base=b)
+        if ruta:
+            posiciones = [n - k for n in ruta]
+            asignada.loc[posiciones, "Profesional"] = profesionales.loc[b, "Nombre"]
+            asignada.loc[posiciones, "Llegada"] = [minutos_a_hora(m) for m in llegadas]
+        filas_resumen.append({"Profesional": profesionales.loc[b, "Nombre"], "Turnos": len(ruta),
+                              "Km": round(km, 1), "Retraso (min)": round(retraso)})
+    resumen = pd.DataFrame(filas_resumen)
+
+    # Km de la asignación que ya tenía la agenda (si todas los turnos tienen profesional conocida)
+    km_actual = None
+    if "Profesional" in agenda_dia.columns and agenda_dia["Profesional"].isin(profesionales["Nombre"]).all():
+        km_actual = 0.0
+        for b, nombre in enumerate(profesionales["Nombre"]):
+            ruta = sorted((k + i for i in np.flatnonzero(agenda_dia["Profesional"] == nombre)), key=lambda n: horas[n])
+            km_actual += simular(ruta, matriz, horas, base=b)[1]
+
+    return {
+        "agenda": asignada.sort_values(["Profesional", "Hora"]).reset_index(drop=True),
+        "resumen": resumen,
+        "km_total": float(resumen["Km"].sum()) if len(resumen) else 0.0,
+        "km_actual": km_actual,
+    }
+
+def asignar_profesional(agenda_dia, profesionales, lat, lon, hora):
+    """Para un pedido nuevo: costo de dárselo a cada profesional a esa hora, de mejor a peor."""
+    agenda_dia = agenda_dia.reset_index(drop=True)
+    profesionales = profesionales.reset_index(drop=True)
+    k = len(profesionales)
+    nuevo = pd.DataFrame({"lat": [lat], "lon": [lon], "Hora": [str(hora)[:5]]})
+    matriz, horas = _nodos_equipo(pd.concat([agenda_dia, nuevo], ignore_index=True), profesionales)
+    nodo = k + len(agenda_dia)
+
+    filas = []
+    for b, nombre in enumerate(profesionales["Nombre"]):
+        propios = np.flatnonzero(agenda_dia.get("Profesional", pd.Series(dtype=object)) == nombre)
+        ruta = sorted((k + int(i) for i in propios), key=lambda n: horas[n])
+        retraso_antes, km_antes, _ = simular(ruta, matriz, horas, base=b)
+        retraso, km, _ = simular(_insertar_por_hora(ruta, nodo, horas), matriz, horas, base=b)
+        filas.append({"Profesional": nombre, "Km Extra": round(km - km_antes, 1),
+                      "Retraso (min)": round(retraso - retraso_antes), "Turnos": len(ruta)})
+    return pd.DataFrame(filas).sort_values(["Retraso (min)", "Km Extra"], kind="stable").reset_index(drop=True)
@@ -0,0 +1,105 @@
+import io
+import importlib
+import importlib.util
+import pandas as pd
+
+# --- LECTOR DE EXCEL CON MOTOR INTERCAMBIABLE ---
+# pandas usa openpyxl por defecto, que está escrito en Python puro y es lento.
+# Si está instalado python-calamine (lector en Rust) lo usamos; si no, volvemos
+# a openpyxl sin que el resto del código se entere.
+
+# Orden de preferencia: el primero disponible gana
+MOTORES_PREFERIDOS = ['calamine', 'openpyxl']
+
+# Paquete que necesita cada motor de pandas
+_PAQUETES = {'calamine': 'python_calamine', 'openpyxl': 'openpyxl'}
+
+# Errores propios de cada motor (no heredan de ValueError): con ellos se prueba el siguiente
+_ERRORES_MOTOR = {'calamine': ('python_calamine', 'CalamineError')}
+
+_motores_cache = None
+
+
+def motores_disponibles():
+    """Lista de motores instalados, en orden de preferencia (se calcula una vez)."""
+    global _motores_cache
+    if _motores_cache is None:
+        _motores_cache = [m for m in MOTORES_PREFERIDOS if importlib.util.find_spec(_PAQUETES[m])]
+    return _motores_cache
+
+def _errores_de(motor):
+    """Excepciones que indican que el motor no pudo con el archivo (y vale probar otro)."""
+    errores = (ImportError, ValueError)
+    if motor in _ERRORES_MOTOR:
+        paquete, clase = _ERRORES_MOTOR[motor]
+        try:
+            errores += (getattr(importlib.import_module(paquete), clase),)
+        except (ImportError, AttributeError):
+            pass
+    return errores
+
+def motor_preferido():
+    disponibles = motores_disponibles()
+    return disponibles[0] if disponibles else None
+
+def leer_excel(datos, columnas=None, hoja=0, motor=None, **kwargs):
+    """Lee un Excel con el motor más rápido disponible.
+
+    - datos: ruta, bytes o archivo en memoria (por ejemplo, lo que sube Streamlit).
+    - columnas: lista de columnas a leer (el resto ni se convierte a pandas).
+    - hoja: nombre o posición de la hoja.
+    - motor: forzar un motor concreto ('calamine', 'openpyxl').
+
+    Si el motor elegido falla por algo propio del motor, se reintenta con el siguiente.
+    """
+    if isinstance(datos, (bytes, bytearray)):
+        datos = io.BytesIO(datos)
+
+    candidatos = [motor] if motor else motores_disponibles()
+    ultimo_error = None
+    for candidato in candidatos:
+        if hasattr(datos, 'seek'):
+            datos.seek(0)  # el intento anterior pudo haber dejado el cursor a mitad
+        try:
+            return pd.read_excel(datos, sheet_name=hoja, usecols=columnas, engine=candidato, **kwargs)
+        except _errores_de(candidato) as e:
+            # ValueError también lo lanza pandas por columnas inexistentes: eso no es del motor
+            if columnas is not None and "usecols" in str(e).lower():
+                raise
+            ultimo_error = e
+    raise ultimo_error or ImportError("No hay ningún motor de Excel instalado (openpyxl / python-calamine).")
+
+def leer_excel_por_bloques(datos, filas=100_000, hoja=0):
+    """Generador: lee el Excel de a `filas` filas sin cargar la hoja entera.
+
+    Usa openpyxl en modo read_only, que recorre el XML de la hoja en streaming (calamine
+    es más rápido pero arma la hoja completa en memoria antes de dar la primera fila).
+    Cada bloque es un DataFrame con el encabezado de la primera fila; las filas vacías
+    se saltean, como en leer_excel.
+    """
+    import openpyxl
+
+    if isinstance(datos, (bytes, bytearray)):
+        datos = io.BytesIO(datos)
+    libro = openpyxl.load_workbook(datos, read_only=True, data_only=True)
+    try:
+        hoja_libro = libro.worksheets[hoja] if isinstance(hoja, int) else libro[hoja]
+        recorrido = hoja_libro.iter_rows(values_only=True)
+        encabezado = next(recorrido, None)
+        if encabezado is None:
+            return
+        columnas = [c if c is not None else f"Unnamed: {i}" for i, c in enumerate(encabezado)]
+        ancho = len(columnas)
+
+        bloque = []
+        for fila in recorrido:
+            if all(v is None for v in fila):
+                continue
+            bloque.append(fila[:ancho] + (None,) * (ancho - len(fila)))
+            if len(bloque) == filas:
+                yield pd.DataFrame.from_records(bloque, columns=columnas)
+                bloque = []
+        if bloque:
+            yield pd.DataFrame.from_records(bloque, columns=columnas)
+    finally:
+        libro.close()
@@ -0,0 +1,901 @@
+import os
+import io
+import json
+import hashlib
+import re
+import uuid
+import shutil
+import tempfile
+import threading
+import itertools
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import xlsxwriter
+import lector_excel
+
+# --- MOTOR DE CONSOLIDACIÓN ---
+# Lo usan tanto el script producto_consolidador.py como la página del Consolidador.
+# Cada archivo se lee en un proceso aparte y, apenas termina, su tabla se escribe
+# en la salida y se libera: la memoria depende de un archivo, no de todos.
+
+
+# --- LECTURA ---
+
+def _nombre_y_datos(fuente):
+    """Acepta una ruta en disco o una tupla (nombre, bytes) de un archivo subido."""
+    if isinstance(fuente, (str, os.PathLike)):
+        return os.path.basename(fuente), fuente
+    nombre, contenido = fuente
+    return nombre, io.BytesIO(contenido)
+
+def leer_archivo(fuente, ruta_parte=None, esquema=None):
+    """Lee un Excel, le agrega la columna de auditoría Origen_Archivo y lo limpia.
+
+    Si se pasa ruta_parte (caché incremental), la tabla cruda se toma de ese Parquet
+    cuando ya existe, o se guarda ahí después de parsear el Excel.
+    Con esquema, la tabla sale con las columnas y tipos unificados del lote.
+    """
+    nombre, datos = _nombre_y_datos(fuente)
+    if ruta_parte and os.path.exists(ruta_parte):
+        df = pd.read_parquet(ruta_parte)
+    else:
+        df = lector_excel.leer_excel(datos)
+        if ruta_parte:
+            _guardar_parte(df, ruta_parte)
+    df['Origen_Archivo'] = nombre
+    propias = None
+    if esquema:
+        propias = columnas_de(df, esquema)
+        df = alinear(df, esquema)
+    return limpiar(df, propias)
+
+def _leer_seguro(tarea, esquema=None):
+    # Corre en el proceso hijo: devolvemos el error como texto para no cortar el lote
+    fuente, ruta_parte = tarea
+    nombre = _nombre_y_datos(fuente)[0]
+    try:
+        return nombre, leer_archivo(fuente, ruta_parte, esquema), None
+    except Exception as e:
+        return nombre, None, str(e)
+
+def leer_en_paralelo(tareas, max_workers=None, esquema=None):
+    """Generador: devuelve (nombre, df, error) a medida que cada archivo termina.
+
+    Cada tarea es (fuente, ruta_parte). Como mucho hay `max_workers` archivos en vuelo,
+    así que la memoria queda acotada aunque lleguen cientos de archivos.
+    """
+    return en_paralelo(_leer_seguro, [(t, esquema) for t in tareas], max_workers)
+
+def en_paralelo(funcion, argumentos, max_workers=None):
+    """Generador: funcion(*args) para cada args en un proceso aparte, en orden de llegada."""
+    argumentos = list(argumentos)
+    max_workers = max_workers or min(os.cpu_count() or 1, len(argumentos)) or 1
+
+    # Con un solo archivo (o un solo worker) no vale la pena levantar procesos
+    if max_workers == 1:
+        for args in argumentos:
+            yield funcion(*args)
+        return
+
+    pendientes = iter(argumentos)
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        en_vuelo = {pool.submit(funcion, *args) for args in _tomar(pendientes, max_workers)}
+        while en_vuelo:
+            listos, en_vuelo = wait(en_vuelo, return_when=FIRST_COMPLETED)
+            for futuro in listos:
+                yield futuro.result()
+                en_vuelo |= {pool.submit(funcion, *args) for args in _tomar(pendientes, 1)}
+
+def _tomar(iterador, n):
+    return [f for _, f in zip(range(n), iterador)]
+
+
+# --- CACHÉ INCREMENTAL (huella por archivo + partes en Parquet) ---
+# Cada archivo se identifica por el hash de su contenido. La tabla ya parseada se
+# guarda en .cache/consolidador/partes/<hash>.parquet: en la siguiente corrida solo
+# se parsean los Excel nuevos o modificados y el resto sale del caché.
+
+DIR_CACHE = os.path.join(".cache", "consolidador")
+
+# La cola corre varios trabajos a la vez en hilos del mismo proceso: el índice de huellas y
+# el de duplicados se leen, se modifican y se vuelven a escribir siempre bajo este candado
+_candado_cache = threading.Lock()
+
+def _ruta_temporal(ruta):
+    # Única por escritura: dos hilos o procesos con el mismo destino no comparten temporal
+    return f"{ruta}.{uuid.uuid4().hex}.tmp"
+
+def _hash_contenido(datos):
+    h = hashlib.blake2b(digest_size=16)
+    if isinstance(datos, (bytes, bytearray)):
+        h.update(datos)
+    else:
+        with open(datos, 'rb') as f:
+            for bloque in iter(lambda: f.read(1 << 20), b''):
+                h.update(bloque)
+    return h.hexdigest()
+
+def huella(fuente, indice):
+    """Hash del contenido de la fuente.
+
+    Para rutas en disco usamos el índice (tamaño + mtime): si no cambiaron, no se
+    vuelve a leer el archivo para hashearlo.
+    """
+    if not isinstance(fuente, (str, os.PathLike)):
+        return _hash_contenido(fuente[1])
+
+    clave = os.path.abspath(fuente)
+    st_archivo = os.stat(fuente)
+    previo = indice.get(clave)
+    if previo and previo['tamano'] == st_archivo.st_size and previo['mtime'] == st_archivo.st_mtime_ns:
+        return previo['hash']
+
+    valor = _hash_contenido(fuente)
+    indice[clave] = {'tamano': st_archivo.st_size, 'mtime': st_archivo.st_mtime_ns, 'hash': valor}
+    return valor
+
+def _leer_indice(dir_cache):
+    ruta = os.path.join(dir_cache, 'indice.json')
+    if os.path.exists(ruta):
+        with open(ruta, encoding='utf-8') as f:
+            return json.load(f)
+    return {}
+
+def _guardar_indice(dir_cache, indice):
+    ruta = os.path.join(dir_cache, 'indice.json')
+    ruta_tmp = _ruta_temporal(ruta)
+    with open(ruta_tmp, 'w', encoding='utf-8') as f:
+        json.dump(indice, f, indent=2)
+    os.replace(ruta_tmp, ruta)
+
+def _guardar_parte(df, ruta_parte):
+    """Guarda la tabla cruda en Parquet. Si tiene columnas con tipos mezclados, no se cachea."""
+    ruta_tmp = _ruta_temporal(ruta_parte)  # dos archivos iguales pueden llegar a la vez
+    try:
+        df.to_parquet(ruta_tmp, index=False)
+        os.replace(ruta_tmp, ruta_parte)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        if os.path.exists(ruta_tmp):
+            os.remove(ruta_tmp)
+
+def preparar_tareas(fuentes, dir_cache=None):
+    """Arma la lista (fuente, ruta_parte) y cuenta cuántas fuentes ya están en caché."""
+    if not dir_cache:
+        return [(f, None) for f in fuentes], 0
+
+    dir_partes = os.path.join(dir_cache, 'partes')
+    os.makedirs(dir_partes, exist_ok=True)
+    tareas, en_cache = [], 0
+    with _candado_cache:
+        indice = _leer_indice(dir_cache)
+        for fuente in fuentes:
+            ruta_parte = os.path.join(dir_partes, huella(fuente, indice) + '.parquet')
+            en_cache += os.path.exists(ruta_parte)
+            tareas.append((fuente, ruta_parte))
+        _guardar_indice(dir_cache, indice)
+    return tareas, en_cache
+
+
+# --- ESQUEMA (nombres y tipos unificados) ---
+# Antes de leer en serio, miramos (en el pool de procesos) una muestra de cada archivo y armamos la unión de
+# columnas con un tipo destino por columna. Así ' fecha ', 'FECHA' y 'Fecha' son la
+# misma columna, y una columna que falta en un archivo llega como nulo tipado
+# (<NA>, NaT) en vez de convertir todo el reporte en columnas object.
+
+MUESTRA_ESQUEMA = 1000
+
+# Columnas conocidas de los reportes de ventas con su tipo fijo
+TIPOS_CONOCIDOS = {
+    'Fecha': 'datetime64[ns]',
+    'Producto': 'string',
+    'Vendedor': 'string',
+    'Sucursal': 'string',
+    'Origen_Archivo': 'string',
+}
+
+def clave_columna(nombre):
+    """' Fécha ' / 'FECHA' / 'fecha' -> 'fecha'. Sirve para emparejar columnas entre archivos."""
+    texto = unicodedata.normalize('NFKD', str(nombre)).encode('ascii', 'ignore').decode()
+    return re.sub(r'[\s_]+', '_', texto.strip().lower())
+
+_CANONICOS = {clave_columna(n): n for n in TIPOS_CONOCIDOS}
+
+def tipo_de(serie):
+    """Tipo destino compacto para una columna de muestra (None si está toda vacía)."""
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        return 'datetime64[ns]'
+    if pd.api.types.is_bool_dtype(serie):
+        return 'boolean'
+    if pd.api.types.is_integer_dtype(serie):
+        return 'Int64'
+    if pd.api.types.is_float_dtype(serie):
+        return 'Float64'
+    if serie.isna().all():
+        return None
+    return 'string'
+
+def _combinar(tipo_a, tipo_b):
+    if tipo_a is None or tipo_a == tipo_b:
+        return tipo_b
+    if tipo_b is None:
+        return tipo_a
+    if {tipo_a, tipo_b} <= {'Int64', 'Float64', 'boolean'}:
+        return 'Float64'
+    return 'string'  # mezcla irreconciliable (ej. fecha en un archivo y texto en otro)
+
+def leer_muestra(tarea, en_disco=False):
+    fuente, ruta_parte = tarea
+    if ruta_parte and os.path.exists(ruta_parte):
+        lote = next(pq.ParquetFile(ruta_parte).iter_batches(batch_size=MUESTRA_ESQUEMA), None)
+        return lote.to_pandas() if lote is not None else pd.read_parquet(ruta_parte)
+    datos = _nombre_y_datos(fuente)[1]
+    if en_disco:
+        # Sin armar la hoja entera en memoria, como la lectura por bloques
+        return next(lector_excel.leer_excel_por_bloques(datos, filas=MUESTRA_ESQUEMA), pd.DataFrame())
+    return lector_excel.leer_excel(datos, nrows=MUESTRA_ESQUEMA)
+
+def _tipos_muestra(tarea, en_disco=False):
+    # Corre en el proceso hijo: vuelve solo [(columna, tipo)], no la muestra
+    try:
+        muestra = leer_muestra(tarea, en_disco)
+    except Exception:
+        return []  # el archivo roto se reporta después, en la lectura completa
+    return [(col, tipo_de(muestra.iloc[:, j])) for j, col in enumerate(muestra.columns)]
+
+def inferir_esquema(tareas, max_workers=None, en_disco=False):
+    """Devuelve {columna: tipo} con la unión de columnas, en orden de aparición.
+
+    Las muestras se leen en paralelo, igual que los archivos completos.
+    """
+    tareas = list(tareas)
+    max_workers = max_workers or min(os.cpu_count() or 1, len(tareas)) or 1
+    if max_workers == 1:
+        tipos_por_archivo = map(_tipos_muestra, tareas, itertools.repeat(en_disco))
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            tipos_por_archivo = list(pool.map(_tipos_muestra, tareas, itertools.repeat(en_disco)))
+
+    esquema = {}
+    nombres = dict(_CANONICOS)  # clave normalizada -> nombre que va al reporte
+    for tipos in tipos_por_archivo:
+        for col, tipo in tipos:
+            clave = clave_columna(col)
+            nombre = nombres.setdefault(clave, re.sub(r'\s+', ' ', str(col).strip()))
+            esquema[nombre] = TIPOS_CONOCIDOS.get(nombre) or _combinar(esquema.get(nombre), tipo)
+
+    esquema['Origen_Archivo'] = TIPOS_CONOCIDOS['Origen_Archivo']
+    # Columnas vacías en todas las muestras: texto
+    return {nombre: tipo or 'string' for nombre, tipo in esquema.items()}
+
+def _perdidos(original, convertida):
+    """Valores con dato que la conversión dejó vacíos (celdas en blanco no cuentan)."""
+    perdidos = convertida.isna() & original.notna()
+    if perdidos.any():
+        perdidos &= original.astype('string').str.strip().ne('')
+    return perdidos
+
+def _convertir(serie, tipo):
+    if tipo.startswith('datetime'):
+        return pd.to_datetime(serie, errors='coerce').astype(tipo)
+    if tipo in ('Int64', 'Float64'):
+        numeros = pd.to_numeric(serie, errors='coerce')
+        # El tipo salió de una muestra: si más abajo hay texto ('A-1400', 'pendiente'), la
+        # columna de este archivo queda mixta (números y ese texto) en vez de perderlo o volverlo 0
+        perdidos = _perdidos(serie, numeros)
+        if perdidos.any():
+            return numeros.astype(object).where(~perdidos, serie)
+        try:
+            return numeros.astype(tipo)
+        except (TypeError, ValueError):
+            return numeros.astype('Float64')  # decimales que no aparecieron en la muestra
+    if tipo == 'boolean':
+        try:
+            return serie.astype('boolean')
+        except (TypeError, ValueError):
+            return serie.astype('string')
+    return serie.astype('string')
+
+def alinear(df, esquema):
+    """Renombra, reordena y castea la tabla al esquema del lote (faltantes como nulos tipados).
+
+    Una columna numérica con valores que no son números queda como object (números y
+    textos) en este archivo: ver columnas_ensanchadas.
+    """
+    por_clave = {clave_columna(n): n for n in esquema}
+    df = df.rename(columns=lambda c: por_clave.get(clave_columna(c), c))
+    df = df.loc[:, ~df.columns.duplicated()]
+
+    columnas = {}
+    for nombre, tipo in esquema.items():
+        if nombre in df.columns:
+            columnas[nombre] = _convertir(df[nombre], tipo)
+        else:
+            columnas[nombre] = pd.Series(index=df.index, dtype=tipo)
+    return pd.DataFrame(columnas, index=df.index)
+
+def columnas_de(df, esquema):
+    """Nombres del esquema que trae la tabla cruda (el resto los agrega alinear como nulos)."""
+    por_clave = {clave_columna(n): n for n in esquema}
+    return [por_clave[k] for k in map(clave_columna, df.columns) if k in por_clave]
+
+def columnas_ensanchadas(df, esquema):
+    """Columnas que en esta tabla no quedaron con el tipo del esquema.
+
+    Pasa cuando la muestra no alcanzó a ver todo: texto en una columna numérica (queda
+    object), decimales en una Int64 (queda Float64) o texto en una booleana.
+    """
+    return [c for c, t in esquema.items() if c in df.columns and str(df[c].dtype) != t]
+
+
+# --- LIMPIEZA (se aplica archivo por archivo) ---
+
+def limpiar(df, columnas=None):
+    """Relleno de vacíos numéricos con 0 sin cambiar el tipo (texto y fechas quedan vacíos).
+
+    Con columnas, solo se rellenan esas (las que traía el archivo): una columna que el
+    archivo no tiene sigue vacía, así una fila de pacientes no suma un Monto 0.
+    """
+    numericas = df.select_dtypes(include='number').columns
+    if columnas is not None:
+        numericas = numericas.intersection(columnas)
+    df[numericas] = df[numericas].fillna(0)
+    return df
+
+
+# --- MODO EN DISCO (archivos que no entran en memoria) ---
+# Cada worker lee su Excel de a bloques (streaming), alinea y limpia cada bloque y lo
+# escribe como Parquet en una carpeta temporal; al proceso principal solo le devuelve
+# las rutas. El principal recorre esas partes de a record batches hacia el sumidero, el
+# acumulador de resúmenes y el índice de duplicados, y borra cada parte al terminarla.
+# Así ni los workers ni el principal tienen nunca un archivo entero en memoria.
+
+FILAS_BLOQUE = 100_000
+
+def _bloques_crudos(fuente, ruta_parte):
+    if ruta_parte and os.path.exists(ruta_parte):
+        # La tabla cruda ya está en el caché incremental
+        with pq.ParquetFile(ruta_parte) as parte:
+            for lote in parte.iter_batches(batch_size=FILAS_BLOQUE):
+                yield lote.to_pandas()
+    else:
+        yield from lector_excel.leer_excel_por_bloques(_nombre_y_datos(fuente)[1], filas=FILAS_BLOQUE)
+
+def _derramar(tarea, esquema, carpeta):
+    """Corre en el proceso hijo: deja el archivo alineado y limpio en carpeta, por bloques.
+
+    Devuelve (nombre, rutas de las partes, error, columnas ensanchadas).
+    """
+    fuente, ruta_parte = tarea
+    nombre = _nombre_y_datos(fuente)[0]
+    rutas, ensanchadas = [], set()
+    try:
+        os.makedirs(carpeta, exist_ok=True)
+        for k, df in enumerate(_bloques_crudos(fuente, ruta_parte)):
+            df['Origen_Archivo'] = nombre
+            propias = columnas_de(df, esquema)
+            df = limpiar(alinear(df, esquema), propias)
+            ensanchadas.update(columnas_ensanchadas(df, esquema))
+            # Números mezclados con texto no entran en una columna Parquet: esa parte los guarda como texto
+            mixtas = [c for c in df.columns if df[c].dtype == object]
+            df[mixtas] = df[mixtas].astype('string')
+            rutas.append(os.path.join(carpeta, f"bloque-{k:05d}.parquet"))
+            df.to_parquet(rutas[-1], index=False)
+    except Exception as e:
+        shutil.rmtree(carpeta, ignore_errors=True)
+        return nombre, [], str(e), []
+    return nombre, rutas, None, [c for c in esquema if c in ensanchadas]
+
+def _leer_derrame(rutas, ensanchadas=()):
+    """Generador: las partes que dejó un worker, de a record batches (cada parte se borra al terminarla).
+
+    Las columnas ensanchadas vuelven a ser mixtas (números y textos), como en la lectura en memoria.
+    """
+    for ruta in rutas:
+        with pq.ParquetFile(ruta) as parte:
+            for lote in parte.iter_batches(batch_size=FILAS_BLOQUE):
+                df = lote.to_pandas()
+                for col in ensanchadas:
+                    if pd.api.types.is_string_dtype(df[col]):
+                        numeros = pd.to_numeric(df[col], errors='coerce')
+                        df[col] = numeros.astype(object).where(numeros.notna(), df[col].astype(object))
+                yield df
+        os.remove(ruta)
+
+
+# --- RESÚMENES (pivot incremental) ---
+# Por cada archivo que llega calculamos un agregado parcial chico
+# (Sucursal x Vendedor x Producto x Mes -> suma y cantidad de Monto). Al final se
+# combinan los parciales y de ahí salen las hojas de resumen, sin armar nunca el maestro.
+
+DIMENSIONES = ['Sucursal', 'Vendedor', 'Producto', 'Mes']
+SIN_DATO = '(sin dato)'
+
+# Hoja -> dimensiones que agrupa (además se arma una tabla cruzada Sucursal x Mes)
+HOJAS_RESUMEN = {
+    'Por Sucursal': ['Sucursal'],
+    'Por Vendedor': ['Vendedor'],
+    'Por Producto': ['Producto'],
+    'Por Mes': ['Mes'],
+}
+
+class AcumuladorResumen:
+    def __init__(self, compactar_cada=32):
+        self.parciales = []
+        self.compactar_cada = compactar_cada
+
+    def agregar(self, df):
+        if 'Monto' not in df.columns:
+            return
+        claves = pd.DataFrame(index=df.index)
+        for dim in DIMENSIONES[:-1]:
+            claves[dim] = df[dim].astype('string') if dim in df.columns else pd.NA
+        if 'Fecha' in df.columns:
+            claves['Mes'] = pd.to_datetime(df['Fecha'], errors='coerce').dt.strftime('%Y-%m')
+        else:
+            claves['Mes'] = pd.NA
+
+        # Filas que no son de ventas (ninguna dimensión cargada) no suman
+        con_datos = claves[DIMENSIONES[:-1]].notna().any(axis=1)
+        claves = claves[con_datos].fillna(SIN_DATO)
+        monto = pd.to_numeric(df.loc[con_datos, 'Monto'], errors='coerce')
+
+        parcial = (claves.assign(Monto=monto)
+                   .groupby(DIMENSIONES, observed=True)['Monto']
+                   .agg(Total='sum', Operaciones='count'))
+        self.parciales.append(parcial)
+        if len(self.parciales) >= self.compactar_cada:
+            self.parciales = [self._combinar()]
+
+    def _combinar(self):
+        if not self.parciales:
+            return pd.DataFrame(columns=['Total', 'Operaciones'])
+        return pd.concat(self.parciales).groupby(level=DIMENSIONES).sum()
+
+    def resumenes(self):
+        """Diccionario hoja -> DataFrame con totales, cantidad y ticket promedio."""
+        cubo = self._combinar()
+        if cubo.empty:
+            return {}
+        hojas = {}
+        for hoja, dims in HOJAS_RESUMEN.items():
+            tabla = cubo.groupby(level=dims).sum().reset_index()
+            tabla['Ticket Promedio'] = tabla['Total'] / tabla['Operaciones'].where(tabla['Operaciones'] > 0)
+            if dims != ['Mes']:
+                tabla = tabla.sort_values('Total', ascending=False)
+            hojas[hoja] = tabla.reset_index(drop=True)
+        # Tabla cruzada para finanzas: Sucursal en filas, Mes en columnas
+        cruzada = cubo['Total'].groupby(level=['Sucursal', 'Mes']).sum().unstack('Mes', fill_value=0)
+        hojas['Sucursal x Mes'] = cruzada.reset_index()
+        return hojas
+
+
+# --- SALIDA ---
+# Todos los sumideros tienen la misma forma: iniciar(esquema), escribir(df), cerrar().
+# Los que admiten varias hojas (Excel) además tienen agregar_resumenes(resumenes).
+
+LARGO_MUESTRA = 200   # filas por archivo que se miran para estimar el ancho de columna
+ANCHO_MAXIMO = 60
+MAX_FILAS_EXCEL = 1_048_576  # límite de filas de una hoja (encabezado incluido)
+
+class SumideroExcel:
+    """Escribe el Excel en modo constant_memory de xlsxwriter: cada fila se vuelca a disco
+    apenas se escribe, así el libro no crece en RAM con la cantidad de filas.
+
+    El ancho de cada columna se estima con una muestra de cada archivo y se va
+    actualizando a medida que llegan (sin convertir columnas enteras a texto).
+    Cuando una hoja llega al límite de filas de Excel, los datos siguen en otra
+    ('Consolidado 2', 'Consolidado 3', ...) con el mismo encabezado.
+    """
+
+    def __init__(self, destino, hoja='Consolidado', max_filas=MAX_FILAS_EXCEL):
+        # Sin 'in_memory': esa opción anula constant_memory. El destino puede ser un BytesIO igual.
+        self.libro = xlsxwriter.Workbook(destino, {'constant_memory': True})
+        self.nombre_hoja = hoja
+        self.max_filas = max_filas
+        self.hoja = self.libro.add_worksheet(hoja)
+        self.hojas = [self.hoja]
+        self.formato_fecha = self.libro.add_format({'num_format': 'dd/mm/yyyy'})
+        self.fila = 1
+
+    def iniciar(self, esquema):
+        self.columnas = list(esquema)
+        self.anchos = [len(str(c)) for c in self.columnas]
+        self.formatos = [self.formato_fecha if str(esquema[c]).startswith('datetime') else None
+                         for c in self.columnas]
+        self.hoja.write_row(0, 0, self.columnas)
+
+    def _hoja_siguiente(self):
+        # En constant_memory la hoja anterior ya quedó volcada: no se vuelve a tocar
+        self.hoja = self.libro.add_worksheet(f"{self.nombre_hoja} {len(self.hojas) + 1}")
+        self.hojas.append(self.hoja)
+        self.hoja.write_row(0, 0, self.columnas)
+        self.fila = 1
+
+    def _medir(self, df):
+        muestra = df.head(LARGO_MUESTRA)
+        for j, col in enumerate(self.columnas):
+            if self.formatos[j] is not None:
+                largo = len('dd/mm/yyyy')
+            else:
+                largo = muestra[col].astype(str).str.len().max()
+            if pd.notna(largo):
+                self.anchos[j] = max(self.anchos[j], int(largo))
+
+    def escribir(self, df):
+        df = df.reindex(columns=self.columnas)
+        self._medir(df)
+        formatos = self.formatos
+
+        # NaN no es válido en Excel: lo mandamos como celda vacía
+        valores = df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)
+        for tupla in valores:
+            if self.fila >= self.max_filas:
+                self._hoja_siguiente()  # xlsxwriter descartaría la fila sin avisar
+            for j, valor in enumerate(tupla):
+                if valor is not None:
+                    self.hoja.write(self.fila, j, valor, formatos[j])
+            self.fila += 1
+
+    def agregar_resumenes(self, resumenes):
+        """Cada resumen va a su propia hoja (son tablas chicas: se escriben de una vez)."""
+        for nombre, tabla in resumenes.items():
+            hoja = self.libro.add_worksheet(nombre)
+            hoja.write_row(0, 0, [str(c) for c in tabla.columns])
+            for i, fila in enumerate(tabla.astype(object).where(tabla.notna(), None).itertuples(index=False), start=1):
+                hoja.write_row(i, 0, fila)
+            for j, col in enumerate(tabla.columns):
+                hoja.set_column(j, j, min(max(len(str(col)), 12) + 2, ANCHO_MAXIMO))
+
+    def cerrar(self):
+        # En constant_memory los anchos se pueden fijar al final: se escriben al armar el XML
+        for hoja in self.hojas:
+            for j, ancho in enumerate(self.anchos):
+                hoja.set_column(j, j, min(ancho + 2, ANCHO_MAXIMO))
+        self.libro.close()
+
+
+class SumideroCSV:
+    """CSV por bloques: cada archivo se agrega al final sin rearmar nada."""
+
+    def __init__(self, destino):
+        self.destino = destino
+        self.propio = isinstance(destino, (str, os.PathLike))
+        self.archivo = open(destino, 'w', encoding='utf-8', newline='') if self.propio else destino
+
+    def iniciar(self, esquema):
+        self.columnas = list(esquema)
+        pd.DataFrame(columns=self.columnas).to_csv(self.archivo, index=False)
+
+    def escribir(self, df):
+        df.reindex(columns=self.columnas).to_csv(self.archivo, index=False, header=False,
+                                                 date_format='%d/%m/%Y')
+
+    def cerrar(self):
+        if self.propio:
+            self.archivo.close()
+
+
+class SumideroParquet:
+    """Parquet por grupos de filas: un row group por archivo de entrada."""
+
+    # El esquema queda fijo al abrir el archivo: una columna Int64 no puede traer texto ni decimales
+    tipos_fijos = True
+
+    def __init__(self, destino):
+        self.destino = destino
+        self.escritor = None
+
+    def iniciar(self, esquema):
+        self.columnas = list(esquema)
+        # El esquema Arrow sale directo de los tipos unificados: todos los archivos encajan
+        vacio = pd.DataFrame({c: pd.Series(dtype=t) for c, t in esquema.items()})
+        self.esquema = pa.Schema.from_pandas(vacio, preserve_index=False)
+        self.escritor = pq.ParquetWriter(self.destino, self.esquema)
+
+    def escribir(self, df):
+        df = df.reindex(columns=self.columnas)
+        self.escritor.write_table(pa.Table.from_pandas(df, schema=self.esquema, preserve_index=False))
+
+    def cerrar(self):
+        self.escritor.close()
+
+
+# Formatos de salida que ofrece la página / el script
+SUMIDEROS = {
+    'xlsx': SumideroExcel,
+    'csv': SumideroCSV,
+    'parquet': SumideroParquet,
+}
+
+
+# --- DUPLICADOS ---
+# Los clientes a veces reenvían el mismo reporte o rangos de fechas que se pisan, y el
+# Monto se contaba dos veces. Cada fila de ventas se resume en un hash (vectorizado, sin
+# bucles de Python) sobre sus columnas clave normalizadas, y se cuenta cuántas veces está
+# cada hash en cada archivo. En modo incremental esos conteos se persisten entre corridas,
+# pero solo participan los archivos del lote actual y con el mismo contenido.
+
+COLUMNAS_DUPLICADO = ['Fecha', 'Producto', 'Vendedor', 'Monto', 'Sucursal']
+ARCHIVO_HASHES = 'hashes.parquet'
+COLUMNAS_INDICE = ['_hash', 'Archivo', 'Huella', 'Veces']
+
+def hash_filas(df):
+    """Hash uint64 por fila sobre las columnas clave, y máscara de filas evaluables.
+
+    Los textos se comparan sin espacios sobrantes ni mayúsculas, las fechas por día y los
+    montos redondeados a centavos. Las filas sin ninguna dimensión de venta (ej. una planilla
+    de pacientes metida en el lote) no se evalúan: todas tendrían la misma clave vacía.
+    """
+    clave = pd.DataFrame(index=df.index)
+    for col in COLUMNAS_DUPLICADO:
+        if col not in df.columns:
+            clave[col] = pd.NA
+        elif col == 'Fecha':
+            clave[col] = pd.to_datetime(df[col], errors='coerce').dt.normalize()
+        elif col == 'Monto':
+            clave[col] = pd.to_numeric(df[col], errors='coerce').round(2)
+        else:
+            clave[col] = df[col].astype('string').str.strip().str.casefold()
+    evaluable = clave[['Producto', 'Vendedor', 'Sucursal']].notna().any(axis=1).to_numpy()
+    return pd.util.hash_pandas_object(clave, index=False).to_numpy(), evaluable
+
+def _valor_de(claves, valores, consulta, faltante):
+    """valores[i] de cada hash de consulta en claves (ordenado), o faltante si no está."""
+    if not len(claves):
+        return np.full(len(consulta), faltante, dtype=valores.dtype)
+    pos = np.minimum(np.searchsorted(claves, consulta), len(claves) - 1)
+    return np.where(claves[pos] == consulta, valores[pos], faltante)
+
+def _ubicar(claves, nuevas):
+    # Posición de inserción de cada hash nuevo y si ya estaba en claves (ordenado)
+    pos = np.searchsorted(claves, nuevas)
+    esta = pos < len(claves)
+    esta[esta] = claves[pos[esta]] == nuevas[esta]
+    return pos, esta
+
+
+class IndiceDuplicados:
+    """Veces que aparece cada hash de fila por archivo, tratado como multiconjunto.
+
+    De una fila que está k veces en un archivo y m veces en otro quedan max(k, m): un
+    reenvío o un rango pisado no suma dos veces, pero dos ventas iguales del mismo día
+    dentro de un archivo siguen siendo dos. Los archivos van en orden (primero los del
+    índice guardado, después los nuevos según llegan) y cada uno aporta solo las
+    repeticiones que superan al máximo de los anteriores.
+    lote es {nombre: huella del contenido} de los archivos de esta corrida: del índice
+    guardado solo se usan las entradas de esos archivos con la misma huella (un archivo
+    corregido se vuelve a contar de cero); las del resto se conservan sin participar.
+    Al guardar se vuelve a leer el índice: lo que otro trabajo guardó mientras tanto para
+    archivos que no son de este lote no se pisa.
+    """
+
+    def __init__(self, ruta=None, lote=None):
+        self.ruta = ruta
+        self.lote = dict(lote or {})
+        self.archivos = []
+        self.reporte = []
+        # Máximo de veces por hash entre los archivos ya contados, y el archivo que lo tiene
+        self.hashes = np.array([], dtype=np.uint64)
+        self.veces = np.array([], dtype=np.int64)
+        self.duenos = np.array([], dtype=np.int32)
+        self._previos = {}   # archivo del índice guardado -> máximo de los anteriores a él
+        self._entradas = []  # tablas con COLUMNAS_INDICE para guardar
+        self._actual = None  # archivo que se está filtrando (puede llegar en varios bloques)
+        if ruta and os.path.exists(ruta):
+            with _candado_cache:
+                tabla = self._leer()
+            huella_lote = tabla['Archivo'].astype(object).map(self.lote)
+            vigentes = (huella_lote == tabla['Huella'].astype(object)).to_numpy()
+            tabla = tabla[vigentes].reset_index(drop=True)
+            if len(tabla):
+                self._entradas.append(tabla)
+                self._cargar(tabla)
+
+    def _leer(self):
+        tabla = pd.read_parquet(self.ruta)
+        if 'Huella' not in tabla.columns:  # índice de una versión anterior: sin huellas
+            tabla['Huella'] = ''
+        if 'Veces' not in tabla.columns:   # ni conteos (un hash por archivo)
+            tabla['Veces'] = 1
+        return tabla[COLUMNAS_INDICE].astype({'Archivo': str, 'Huella': str})
+
+    def _cargar(self, tabla):
+        # El orden de los archivos es el de su primera aparición en el índice guardado
+        archivos = pd.Categorical(tabla['Archivo'], categories=pd.unique(tabla['Archivo']))
+        self.archivos = list(archivos.categories)
+        h = tabla['_hash'].to_numpy().astype(np.uint64)
+        v = tabla['Veces'].to_numpy().astype(np.int64)
+        c = archivos.codes.astype(np.int32)
+        orden = np.lexsort((c, h))
+        h, v, c = h[orden], v[orden], c[orden]
+
+        # Por hash, el máximo acumulado hasta cada archivo y el archivo que lo alcanzó
+        maximo = pd.Series(v).groupby(h).cummax()
+        previo = maximo.groupby(h).shift(fill_value=0).to_numpy()
+        dueno = pd.Series(np.where(v > previo, c, np.nan)).groupby(h).ffill()
+        dueno_previo = dueno.groupby(h).shift().fillna(-1).to_numpy().astype(np.int32)
+        for codigo in np.unique(c):
+            propio = c == codigo
+            self._previos[self.archivos[codigo]] = (h[propio], previo[propio], dueno_previo[propio])
+
+        ultimo = np.r_[h[1:] != h[:-1], True]
+        self.hashes = h[ultimo]
+        self.veces = maximo.to_numpy()[ultimo]
+        self.duenos = dueno.to_numpy()[ultimo].astype(np.int32)
+
+    def _codigo(self, archivo):
+        if archivo not in self.archivos:
+            self.archivos.append(archivo)
+        return self.archivos.index(archivo)
+
+    def empezar(self, archivo):
+        """Abre un archivo para filtrarlo en uno o más bloques (filtrar_bloque) hasta terminar()."""
+        guardado = archivo in self._previos
+        self._actual = {
+            'archivo': archivo, 'codigo': self._codigo(archivo), 'nuevo': not guardado,
+            # Un archivo del índice guardado se compara con los anteriores a él; uno nuevo, con todos
+            'referencia': self._previos.pop(archivo) if guardado else (self.hashes, self.veces, self.duenos),
+            'hashes': np.array([], dtype=np.uint64), 'veces': np.array([], dtype=np.int64),
+            'filas': 0, 'duplicados': 0, 'coinciden': set(),
+        }
+
+    def filtrar_bloque(self, df):
+        """Devuelve el bloque sin las filas que ya aportaron los archivos anteriores."""
+        actual = self._actual
+        hashes, evaluable = hash_filas(df)
+        h = hashes[evaluable]
+
+        # Número de aparición de cada fila dentro del archivo (contando los bloques anteriores)
+        ocurrencia = (pd.Series(h).groupby(h).cumcount().to_numpy()
+                      + _valor_de(actual['hashes'], actual['veces'], h, 0))
+        ref_hashes, ref_veces, ref_duenos = actual['referencia']
+        repetida = ocurrencia < _valor_de(ref_hashes, ref_veces, h, 0)
+        duplicada = np.zeros(len(df), dtype=bool)
+        duplicada[evaluable] = repetida
+
+        actual['filas'] += len(df)
+        actual['duplicados'] += int(repetida.sum())
+        actual['coinciden'].update(_valor_de(ref_hashes, ref_duenos, h[repetida], -1).tolist())
+
+        unicos, veces = np.unique(h, return_counts=True)
+        pos, esta = _ubicar(actual['hashes'], unicos)
+        actual['veces'] = actual['veces'].copy()
+        actual['veces'][pos[esta]] += veces[esta]
+        actual['hashes'] = np.insert(actual['hashes'], pos[~esta], unicos[~esta])
+        actual['veces'] = np.insert(actual['veces'], pos[~esta], veces[~esta])
+        return df[~duplicada] if duplicada.any() else df
+
+    def terminar(self):
+        """Cierra el archivo abierto: sus conteos pasan al índice y se anota en el reporte."""
+        actual, self._actual = self._actual, None
+        if actual['nuevo'] and len(actual['hashes']):
+            self._subir_maximo(actual['hashes'], actual['veces'], actual['codigo'])
+            self._entradas.append(pd.DataFrame({
+                '_hash': actual['hashes'], 'Archivo': actual['archivo'],
+                'Huella': self.lote.get(actual['archivo'], ''), 'Veces': actual['veces'],
+            }))
+        coinciden = sorted(self.archivos[c] for c in actual['coinciden'] if c >= 0)
+        self.reporte.append({'Archivo': actual['archivo'], 'Filas': actual['filas'],
+                             'Duplicados': actual['duplicados'], 'Coincide Con': ', '.join(coinciden)})
+
+    def filtrar(self, df, archivo):
+        """Devuelve df (un archivo entero) sin sus filas duplicadas y anota cuántas y de quién."""
+        self.empezar(archivo)
+        df = self.filtrar_bloque(df)
+        self.terminar()
+        return df
+
+    def _subir_maximo(self, hashes, veces, codigo):
+        pos, esta = _ubicar(self.hashes, hashes)
+        mayor = esta.copy()
+        mayor[esta] = veces[esta] > self.veces[pos[esta]]
+        self.veces = self.veces.copy()
+        self.duenos = self.duenos.copy()
+        self.veces[pos[mayor]] = veces[mayor]
+        self.duenos[pos[mayor]] = codigo
+        nuevos = ~esta
+        self.hashes = np.insert(self.hashes, pos[nuevos], hashes[nuevos])
+        self.veces = np.insert(self.veces, pos[nuevos], veces[nuevos])
+        self.duenos = np.insert(self.duenos, pos[nuevos], codigo)
+
+    def tabla_reporte(self):
+        """Duplicados por archivo, para el resumen (y la hoja 'Duplicados' del Excel)."""
+        return pd.DataFrame(self.reporte, columns=['Archivo', 'Filas', 'Duplicados', 'Coincide Con'])
+
+    def guardar(self):
+        if not self.ruta:
+            return
+        tabla = (pd.concat(self._entradas, ignore_index=True) if self._entradas
+                 else pd.DataFrame({'_hash': pd.Series(dtype=np.uint64), 'Archivo': pd.Series(dtype=str),
+                                    'Huella': pd.Series(dtype=str), 'Veces': pd.Series(dtype=np.int64)}))
+        with _candado_cache:
+            if os.path.exists(self.ruta):
+                # Las entradas de archivos fuera del lote salen del índice de ahora, no del leído al empezar
+                actual = self._leer()
+                tabla = pd.concat([tabla, actual[~actual['Archivo'].isin(list(self.lote))]], ignore_index=True)
+            ruta_tmp = _ruta_temporal(self.ruta)
+            tabla.to_parquet(ruta_tmp, index=False)
+            os.replace(ruta_tmp, self.ruta)
+
+
+def consolidar(fuentes, sumidero, max_workers=None, al_avanzar=None, filas_vista_previa=5, dir_cache=None,
+               deduplicar=False, en_disco=False, dir_temporal=None):
+    """Lee todas las fuentes en paralelo y vuelca cada tabla al sumidero apenas está lista.
+
+    al_avanzar(hechos, total, nombre) se llama después de cada archivo (barra de progreso).
+    Con dir_cache (modo incremental) solo se parsean los archivos nuevos o modificados.
+    Con deduplicar se descartan las filas de venta que ya llegaron en otro archivo del lote.
+    Con en_disco cada archivo pasa por Parquet temporal en dir_temporal y se vuelca por
+    bloques (ver MODO EN DISCO): para archivos que no entran en memoria.
+    Devuelve un resumen con filas, archivos, errores, el esquema y una vista previa.
+    """
+    tareas, en_cache = preparar_tareas(list(fuentes), dir_cache)
+    esquema = inferir_esquema(tareas, max_workers, en_disco)
+    sumidero.iniciar(esquema)
+    resumen = {'filas': 0, 'archivos': 0, 'errores': [], 'vista_previa': None, 'monto_total': 0,
+               'desde_cache': en_cache, 'esquema': esquema, 'resumenes': {}, 'duplicados': 0}
+    acumulador = AcumuladorResumen()
+
+    def volcar(df):
+        sumidero.escribir(df)
+        acumulador.agregar(df)
+        resumen['filas'] += len(df)
+        if 'Monto' in df.columns:
+            resumen['monto_total'] += pd.to_numeric(df['Monto'], errors='coerce').sum()
+        if resumen['vista_previa'] is None and len(df):
+            resumen['vista_previa'] = df.head(filas_vista_previa)
+
+    indice = None
+    if deduplicar:
+        # La huella del contenido es el nombre de la parte en caché (<hash>.parquet)
+        lote = {_nombre_y_datos(fuente)[0]: os.path.splitext(os.path.basename(ruta_parte))[0]
+                for fuente, ruta_parte in tareas if ruta_parte}
+        indice = IndiceDuplicados(os.path.join(dir_cache, ARCHIVO_HASHES) if dir_cache else None, lote)
+
+    # Las dos lecturas dan (nombre, contenido, error, columnas ensanchadas); en disco el
+    # contenido son las rutas de las partes, si no, la tabla entera
+    carpeta_temporal = tempfile.mkdtemp(prefix='consolidador-', dir=dir_temporal) if en_disco else None
+    try:
+        if en_disco:
+            lecturas = en_paralelo(_derramar, [(t, esquema, os.path.join(carpeta_temporal, f"{i:05d}"))
+                                               for i, t in enumerate(tareas)], max_workers)
+        else:
+            lecturas = ((nombre, df, error, columnas_ensanchadas(df, esquema) if df is not None else [])
+                        for nombre, df, error in leer_en_paralelo(tareas, max_workers, esquema))
+
+        for hechos, (nombre, contenido, error, ensanchadas) in enumerate(lecturas, start=1):
+            if error:
+                resumen['errores'].append((nombre, error))
+            elif getattr(sumidero, 'tipos_fijos', False) and ensanchadas:
+                # Mejor avisar que escribir esos valores como vacíos o 0
+                resumen['errores'].append((nombre, f"Valores que no encajan en el tipo de la columna "
+                                                  f"({', '.join(ensanchadas)}): "
+                                                  "usar xlsx o csv para conservar esos valores"))
+            else:
+                resumen['archivos'] += 1
+                if indice:
+                    indice.empezar(nombre)
+                for df in (_leer_derrame(contenido, ensanchadas) if en_disco else [contenido]):
+                    volcar(indice.filtrar_bloque(df) if indice else df)
+                if indice:
+                    indice.terminar()
+            if al_avanzar:
+                al_avanzar(hechos, len(tareas), nombre)
+    finally:
+        if carpeta_temporal:
+            shutil.rmtree(carpeta_temporal, ignore_errors=True)
+
+    resumen['resumenes'] = acumulador.resumenes()
+    if indice:
+        reporte = indice.tabla_reporte()
+        resumen['duplicados'] = int(reporte['Duplicados'].sum())
+        resumen['resumenes']['Duplicados'] = reporte
+        indice.guardar()
+    if resumen['resumenes'] and hasattr(sumidero, 'agregar_resumenes'):
+        sumidero.agregar_resumenes(resumen['resumenes'])
+    sumidero.cerrar()
+    return resumen
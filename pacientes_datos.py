@@ -0,0 +1,192 @@
+import os
+import time
+import hashlib
+import threading
+import collections
+import urllib.parse
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# --- CONSTANTES ---
+# Historial de sesiones de Gestión de Pacientes: un almacén Parquet particionado por Cliente
+# (una carpeta "Cliente=<nombre>" por paciente, el mismo formato hive que el histórico STM).
+# Cada carga de Excel agrega archivos nuevos solo en las carpetas que toca, y ver a un
+# paciente lee únicamente su carpeta, sin importar cuántos años o pacientes haya guardados.
+DIR_PACIENTES = "datos_pacientes"
+
+COLUMNAS_PACIENTES = ['Fecha', 'Cliente', 'Puntaje', 'Notas']
+COLUMNAS_MINIMAS = ['Fecha', 'Cliente', 'Puntaje']
+
+# Tipos fijos: todos los archivos de una carpeta se leen juntos sin unificar esquemas
+ESQUEMA_SESIONES = pa.schema([
+    ('Fecha', pa.timestamp('ms')),
+    ('Puntaje', pa.float64()),
+    ('Notas', pa.string()),
+])
+
+# Cada carga suma un archivo por paciente; pasado este número la carpeta se compacta en uno
+MAX_PARTES = 8
+
+# Planillas subidas que se mantienen ya parseadas (las menos usadas se descartan primero)
+TAMANO_CACHE_PLANILLAS = 8
+
+
+# --- FUNCIONES AUXILIARES ---
+
+def _carpeta(cliente, dir_pacientes=DIR_PACIENTES):
+    # Mismo escape que usa pyarrow para las particiones hive (espacios, barras, acentos)
+    return os.path.join(dir_pacientes, "Cliente=" + urllib.parse.quote(str(cliente), safe=""))
+
+def _partes(carpeta):
+    if not os.path.isdir(carpeta):
+        return []
+    return sorted(os.path.join(carpeta, f) for f in os.listdir(carpeta)
+                  if f.endswith(".parquet") and not f.startswith((".", "_")))
+
+def _escribir(df, ruta):
+    # Temporal oculto + rename: quien lee la carpeta nunca ve un archivo a medio escribir
+    ruta_tmp = os.path.join(os.path.dirname(ruta), "." + os.path.basename(ruta) + ".tmp")
+    tabla = pa.Table.from_pandas(df[ESQUEMA_SESIONES.names], schema=ESQUEMA_SESIONES, preserve_index=False)
+    pq.write_table(tabla, ruta_tmp)
+    os.replace(ruta_tmp, ruta)
+
+def _leer(carpeta, columnas=None):
+    partes = _partes(carpeta)
+    if not partes:
+        return pd.DataFrame({c: pd.Series(dtype=ESQUEMA_SESIONES.field(c).type.to_pandas_dtype())
+                             for c in (columnas or ESQUEMA_SESIONES.names)})
+    return pq.read_table(partes, columns=columnas, schema=ESQUEMA_SESIONES).to_pandas()
+
+def normalizar(df):
+    """Deja una planilla de sesiones con las columnas y tipos del almacén.
+
+    Descarta filas sin fecha o sin cliente. Lanza ValueError si faltan columnas mínimas.
+    """
+    faltan = [c for c in COLUMNAS_MINIMAS if c not in df.columns]
+    if faltan:
+        raise ValueError(f"El Excel debe tener al menos estas columnas: {', '.join(COLUMNAS_MINIMAS)}")
+
+    df = df.reindex(columns=COLUMNAS_PACIENTES).copy()
+    # A milisegundos, como en el almacén: si no, la misma sesión no se reconocería al re-subirla
+    df['Fecha'] = pd.to_datetime(df['Fecha'], errors='coerce').astype('datetime64[ms]')
+    df['Cliente'] = df['Cliente'].astype('string').str.strip()
+    df['Puntaje'] = pd.to_numeric(df['Puntaje'], errors='coerce')
+    df['Notas'] = df['Notas'].astype('string')
+    return df[df['Fecha'].notna() & df['Cliente'].notna() & (df['Cliente'] != "")]
+
+
+# --- ESCRITURA ---
+
+def agregar_sesiones(df, dir_pacientes=DIR_PACIENTES):
+    """Agrega sesiones al historial, un archivo nuevo por paciente tocado.
+
+    Una sesión con el mismo Cliente y Fecha que una ya guardada se ignora, así volver a
+    subir la misma planilla (o una versión con meses nuevos) no duplica nada.
+    Devuelve la cantidad de sesiones nuevas.
+    """
+    df = normalizar(df)
+    sello = time.time_ns()
+    nuevas = 0
+    for cliente, sesiones in df.groupby('Cliente', sort=False):
+        carpeta = _carpeta(cliente, dir_pacientes)
+        guardadas = _leer(carpeta, columnas=['Fecha'])['Fecha']
+        sesiones = sesiones.drop_duplicates('Fecha')
+        sesiones = sesiones[~sesiones['Fecha'].isin(guardadas)]
+        if sesiones.empty:
+            continue
+
+        os.makedirs(carpeta, exist_ok=True)
+        _escribir(sesiones, os.path.join(carpeta, f"sesiones-{sello}.parquet"))
+        nuevas += len(sesiones)
+        if len(_partes(carpeta)) > MAX_PARTES:
+            compactar(cliente, dir_pacientes)
+    return nuevas
+
+def agregar_sesion(cliente, fecha, puntaje, notas=None, dir_pacientes=DIR_PACIENTES):
+    """Alta de una sola sesión (formulario de la página)."""
+    fila = pd.DataFrame([{'Fecha': fecha, 'Cliente': cliente, 'Puntaje': puntaje, 'Notas': notas}])
+    return agregar_sesiones(fila, dir_pacientes)
+
+def compactar(cliente, dir_pacientes=DIR_PACIENTES):
+    """Junta todos los archivos de un paciente en uno solo, ordenado por fecha."""
+    carpeta = _carpeta(cliente, dir_pacientes)
+    partes = _partes(carpeta)
+    if len(partes) <= 1:
+        return
+    df = _leer(carpeta).sort_values('Fecha', kind='stable')
+    _escribir(df, os.path.join(carpeta, f"sesiones-{time.time_ns()}.parquet"))
+    for ruta in partes:
+        os.remove(ruta)
+
+
+# --- LECTURA ---
+
+def pacientes(dir_pacientes=DIR_PACIENTES):
+    """Lista los pacientes mirando solo los nombres de las carpetas (no lee datos)."""
+    if not os.path.isdir(dir_pacientes):
+        return []
+    return sorted(urllib.parse.unquote(d.split("=", 1)[1])
+                  for d in os.listdir(dir_pacientes) if d.startswith("Cliente="))
+
+def historial(cliente, dir_pacientes=DIR_PACIENTES):
+    """Sesiones de un solo paciente ordenadas por fecha (lee solo su carpeta)."""
+    df = _leer(_carpeta(cliente, dir_pacientes)).sort_values('Fecha', kind='stable', ignore_index=True)
+    df.insert(1, 'Cliente', cliente)
+    return df
+
+def version(cliente, dir_pacientes=DIR_PACIENTES):
+    """Cambia cada vez que se agregan o compactan sesiones del paciente (para los cachés)."""
+    carpeta = _carpeta(cliente, dir_pacientes)
+    return os.stat(carpeta).st_mtime_ns if os.path.isdir(carpeta) else 0
+
+
+# --- PLANILLAS SUBIDAS ---
+# Para mirar un Excel sin guardarlo: se parsea una sola vez por contenido (no en cada rerun
+# de Streamlit) y queda indexado por cliente, así cambiar de paciente es buscar en un
+# diccionario en vez de filtrar y ordenar la planilla entera.
+
+class PlanillaPacientes:
+    def __init__(self, df):
+        self.df = normalizar(df)
+        self.clientes = list(self.df['Cliente'].unique())  # en el orden de la planilla
+        ordenado = self.df.sort_values('Fecha', kind='stable')
+        self._por_cliente = dict(tuple(ordenado.groupby('Cliente', sort=False)))
+
+    def __len__(self):
+        return len(self.df)
+
+    def sesiones(self, cliente):
+        """Sesiones del cliente ordenadas por fecha (copia: el tablero le agrega columnas)."""
+        return self._por_cliente[cliente].copy()
+
+_planillas = collections.OrderedDict()
+_candado = threading.Lock()  # cada sesión de Streamlit corre en su propio hilo
+
+def huella(contenido):
+    """Hash del contenido del archivo: el mismo Excel subido dos veces da la misma clave."""
+    return hashlib.blake2b(contenido, digest_size=16).hexdigest()
+
+def planilla_cacheada(contenido, parsear, maximo=TAMANO_CACHE_PLANILLAS):
+    """PlanillaPacientes de los bytes de un Excel, parseándolo solo si no está en el caché.
+
+    parsear recibe los bytes y devuelve el DataFrame crudo (ej. lector_excel.leer_excel).
+    """
+    clave = huella(contenido)
+    with _candado:
+        if clave in _planillas:
+            _planillas.move_to_end(clave)
+            return _planillas[clave]
+
+    # El parseo va fuera del candado: un Excel grande no frena a las otras sesiones
+    planilla = PlanillaPacientes(parsear(contenido))
+    with _candado:
+        _planillas[clave] = planilla
+        _planillas.move_to_end(clave)
+        while len(_planillas) > maximo:
+            _planillas.popitem(last=False)
+    return planilla
+
+def limpiar_cache():
+    with _candado:
+        _planillas.clear()
@@ -1,7 +1,7 @@
 import streamlit as st
-import pandas as pd
 import plotly.express as px  # <--- LA NUEVA ESTRELLA INTERACTIVA
 import plotly.graph_objects as go # Para gráficos más complejos
+import stm_datos
 
 # CONFIGURACIÓN DE LA PÁGINA
 st.set_page_config(page_title="Monitor Ciclovía 18 de Julio", page_icon="🚲", layout="wide")
@@ -11,27 +11,82 @@ st.title("🚲 Monitor de Movilidad: Ciclovía 18 de Julio")
 st.markdown("Tablero interactivo: **Haz zoom**, selecciona áreas y pasa el mouse sobre los datos.")
 
 # 1. CARGA DE DATOS
+# La descarga y el parseo viven en stm_datos.py: el CSV se baja una vez, se revalida
+# con ETag/Last-Modified y se guarda una foto columnar (Feather) que se abre al instante.
+st.sidebar.header("Fuente de Datos")
+origen = st.sidebar.radio("Origen", ["Portal Montevideo (con caché)", "Histórico (todos los años)", "Archivo local (offline)"])
+ruta_local = None
+if origen == "Archivo local (offline)":
+    ruta_local = st.sidebar.text_input("Ruta del CSV", value="conteo_ciclovia_2025.csv")
+
 @st.cache_data
-def cargar_datos():
-    url_bici = "https://ckan-data.montevideo.gub.uy/dataset/15a3de29-2353-4d5f-9bae-e1617fa9e974/resource/6ada7fb7-cd03-4752-8b73-ef083df739aa/download/conteo_ciclovia_2025.csv"
-    df = pd.read_csv(url_bici, encoding='utf-8', on_bad_lines='skip')
-    df.columns = df.columns.str.strip().str.lower()
-    
-    # Procesamiento
-    df['fecha_dt'] = pd.to_datetime(df['fecha'], dayfirst=True, errors='coerce')
-    df['hora_num'] = pd.to_numeric(df['hora'].astype(str).str.split(':').str[0], errors='coerce')
-    df['total_bicis'] = df['hacia_ciudad_vieja'] + df['hacia_tres_cruces']
-    
-    return df
+def cargar_datos(fuente=None):
+    return stm_datos.cargar_ciclovia(fuente)
+
+# Histórico: solo se leen las particiones del sensor y rango de fechas elegidos.
+# Pocos rangos en caché: cada uno es un DataFrame completo y el histórico sigue creciendo.
+MAX_RANGOS_EN_CACHE = 4
+
+@st.cache_data(max_entries=MAX_RANGOS_EN_CACHE)
+def cargar_historico(sensor, desde, hasta):
+    return stm_datos.cargar_historico(sensor, desde, hasta)
+
+# Cubo pre-agregado (día x hora x sentido): se arma una vez por versión de datos
+# y todos los KPIs y gráficos salen de ahí sin volver a recorrer las filas.
+@st.cache_data
+def obtener_cubo(fuente=None):
+    return stm_datos.construir_cubo(cargar_datos(fuente))
+
+@st.cache_data(max_entries=MAX_RANGOS_EN_CACHE)
+def obtener_cubo_historico(sensor, desde, hasta):
+    return stm_datos.construir_cubo(cargar_historico(sensor, desde, hasta))
+
+if origen == "Histórico (todos los años)":
+    if st.sidebar.button("🔄 Actualizar histórico desde el portal"):
+        with st.spinner("Descargando años y puntos de conteo..."):
+            try:
+                nuevos = stm_datos.actualizar_historico()
+                st.cache_data.clear()
+                st.sidebar.success(f"{nuevos} archivo(s) nuevos o actualizados.")
+            except Exception as e:
+                st.sidebar.error(f"No se pudo actualizar: {e}")
+
+    sensores = stm_datos.sensores_disponibles()
+    if not sensores:
+        st.info("👋 El histórico está vacío. Usa **Actualizar histórico** en la barra lateral.")
+        st.stop()
+
+    sensor = st.sidebar.selectbox("Punto de conteo", sensores)
+    minimo, maximo = stm_datos.rango_disponible(sensor)
+    rango = st.sidebar.date_input("Rango de fechas", (minimo, maximo), min_value=minimo, max_value=maximo)
+    if len(rango) != 2:
+        st.stop()  # El usuario todavía está eligiendo la fecha final
+    desde, hasta = rango
 
 with st.spinner('Cargando datos...'):
-    df = cargar_datos()
+    try:
+        if origen == "Histórico (todos los años)":
+            df = cargar_historico(sensor, desde, hasta)
+            cubo = obtener_cubo_historico(sensor, desde, hasta)
+            clave_datos = ("historico", sensor, str(desde), str(hasta))
+        else:
+            df = cargar_datos(ruta_local)
+            cubo = obtener_cubo(ruta_local)
+            clave_datos = ("snapshot", ruta_local)
+    except Exception as e:
+        st.error(f"No se pudieron cargar los datos: {e}")
+        st.stop()
+
+if df.empty:
+    st.warning("No hay registros para la selección actual.")
+    st.stop()
 
 # 2. KPIS
-total_mes = df['total_bicis'].sum()
-promedio_diario = df.groupby('fecha_dt')['total_bicis'].sum().mean()
-dia_pico_fecha = df.groupby('fecha_dt')['total_bicis'].sum().idxmax()
-dia_pico_valor = df.groupby('fecha_dt')['total_bicis'].sum().max()
+indicadores = stm_datos.kpis(cubo)
+total_mes = indicadores['total']
+promedio_diario = indicadores['promedio_diario']
+dia_pico_fecha = indicadores['dia_pico_fecha']
+dia_pico_valor = indicadores['dia_pico_valor']
 
 col1, col2, col3 = st.columns(3)
 col1.metric("Total Viajes (Mes)", f"{total_mes:,.0f}")
@@ -61,7 +116,7 @@ c1, c2 = st.columns(2)
 
 with c1:
     st.subheader(f"⏱️ Perfil Horario ({sentido})")
-    patron = df.groupby('hora_num')[col_analisis].mean().reset_index()
+    patron = stm_datos.perfil_horario(cubo, col_analisis)
     
     # Gráfico de LÍNEA interactivo
     fig_hora = px.line(patron, x='hora_num', y=col_analisis, 
@@ -76,29 +131,10 @@ with c1:
 
 with c2:
     st.subheader("📅 Evolución Diaria (Picos Mensuales)")
-    diario = df.groupby('fecha_dt')[col_analisis].sum().reset_index()
-    
-    # 1. TRADUCIR DÍAS A ESPAÑOL
-    diario['nombre_dia_en'] = diario['fecha_dt'].dt.day_name()
-    mapa_dias = {
-        'Monday': 'Lunes', 'Tuesday': 'Martes', 'Wednesday': 'Miércoles', 
-        'Thursday': 'Jueves', 'Friday': 'Viernes', 'Saturday': 'Sábado', 'Sunday': 'Domingo'
-    }
-    diario['nombre_dia'] = diario['nombre_dia_en'].map(mapa_dias)
+    # Total por día + nombre en español + etiqueta solo en el pico de cada mes
+    diario = stm_datos.serie_diaria(cubo, col_analisis)
     
-    # 2. DETECTAR EL MÁXIMO DE CADA MES
-    # Creamos una columna auxiliar Mes-Año para agrupar
-    diario['mes_año'] = diario['fecha_dt'].dt.to_period('M')
-    
-    # Buscamos los índices (filas) donde ocurre el máximo de cada mes
-    idx_maximos = diario.groupby('mes_año')[col_analisis].idxmax()
-    
-    # 3. CREAR LA ETIQUETA (Solo para los ganadores)
-    diario['etiqueta_pico'] = "" # Por defecto vacía
-    # Llenamos solo las filas ganadoras con el nombre del día
-    diario.loc[idx_maximos, 'etiqueta_pico'] = diario.loc[idx_maximos, 'nombre_dia']
-    
-    # 4. GRÁFICO CON TEXTO SELECTIVO
+    # GRÁFICO CON TEXTO SELECTIVO
     fig_dia = px.bar(diario, x='fecha_dt', y=col_analisis,
                      title="Volumen Total por Día",
                      text='etiqueta_pico', # <--- AQUÍ ESTÁ LA MAGIA
@@ -115,16 +151,12 @@ st.subheader("🔥 Mapa de Calor: Intensidad de Uso (Día vs Hora)")
 st.markdown("Este gráfico muestra las **zonas rojas** de congestión combinando día y hora.")
 
 # 1. PREPARACIÓN DE DATOS (Lógica traída del Notebook)
-# Necesitamos el día de la semana para este gráfico específico
-df['dia_semana_en'] = df['fecha_dt'].dt.day_name()
-
 # Definimos orden lógico (no alfabético) y traducción
-orden_dias = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-mapa_espanol = {'Monday': 'Lunes', 'Tuesday': 'Martes', 'Wednesday': 'Miércoles', 'Thursday': 'Jueves', 
-                'Friday': 'Viernes', 'Saturday': 'Sábado', 'Sunday': 'Domingo'}
+orden_dias = stm_datos.ORDEN_DIAS
+mapa_espanol = stm_datos.DIAS_ES
 
-# Agrupamos: Promedio de bicis por combinación Día-Hora
-heatmap_data = df.groupby(['dia_semana_en', 'hora_num'])['total_bicis'].mean().reset_index()
+# Promedio de bicis por combinación Día-Hora, directo desde el cubo
+heatmap_data = stm_datos.heatmap_semanal(cubo)
 
 # 2. CREAMOS EL GRÁFICO CON PLOTLY
 fig_heat = px.density_heatmap(
@@ -151,7 +183,7 @@ st.divider()
 st.subheader("🔄 Análisis de Flujos Cruzados (Hora Pico)")
 
 # Preparamos los datos para el gráfico de doble línea
-patron_total = df.groupby('hora_num')[['hacia_ciudad_vieja', 'hacia_tres_cruces']].mean().reset_index()
+patron_total = stm_datos.perfil_horario(cubo, ['hacia_ciudad_vieja', 'hacia_tres_cruces'])
 
 fig_cruce = go.Figure()
 fig_cruce.add_trace(go.Scatter(x=patron_total['hora_num'], y=patron_total['hacia_ciudad_vieja'], 
@@ -165,38 +197,48 @@ fig_cruce.update_layout(title="Comparativa de Sentidos (Zoom disponible)",
 st.plotly_chart(fig_cruce, use_container_width=True)
 
 # --- SECCIÓN NUEVA: TABLA DE DATOS DETALLADA ---
+# Índice de orden por TOTAL (desc), cacheado por versión de datos. El df no se hashea (_df).
+@st.cache_data(max_entries=MAX_RANGOS_EN_CACHE)
+def obtener_orden(clave, _df):
+    return stm_datos.indice_orden(_df, 'total_bicis', descendente=True)
+
 st.divider()
 st.subheader("📋 Auditoría de Datos (Tabla Detallada)")
 
 # Usamos un 'expander' para que la tabla esté oculta por defecto y no ensucie la vista
 with st.expander("🔎 Ver Tabla Completa de Registros"):
     
-    # 1. PREPARACIÓN DE LA VISTA
-    # Seleccionamos solo las columnas que importan para mostrar
-    columnas_visibles = ['fecha', 'hora', 'total_bicis', 'hacia_ciudad_vieja', 'hacia_tres_cruces', 'dia_semana_en']
-    
-    # Creamos una copia para no romper el dataframe original
-    df_tabla = df[columnas_visibles].copy()
+    # 1. ORDEN PRECALCULADO (una vez por versión de datos)
+    # Guardamos solo el índice argsort; la tabla se arma página a página
+    orden = obtener_orden(clave_datos, df)
     
-    # Traducimos el día para que se vea bien en la tabla
-    df_tabla['dia_semana_en'] = df_tabla['dia_semana_en'].map(mapa_espanol)
-    df_tabla.rename(columns={'dia_semana_en': 'Día', 'total_bicis': 'TOTAL'}, inplace=True)
+    # 2. PAGINACIÓN: al navegador solo viaja la página visible
+    cp1, cp2 = st.columns([1, 3])
+    tamano_pagina = cp1.selectbox("Filas por página", [50, 100, 250, 500], index=1)
+    total_paginas = max(1, -(-len(orden) // tamano_pagina))
+    pagina = cp2.number_input(f"Página (de {total_paginas})", min_value=1, max_value=total_paginas, value=1)
     
-    # 2. MOSTRAR TABLA INTERACTIVA
-    # 'use_container_width=True' hace que ocupe todo el ancho
     st.dataframe(
-        df_tabla.sort_values(by='TOTAL', ascending=False), # Ordenado por los récords primero
+        stm_datos.pagina_auditoria(df, orden, pagina, tamano_pagina), # Ordenado por los récords primero
         use_container_width=True,
         hide_index=True # Ocultamos el número de fila (0, 1, 2...) que no aporta mucho
     )
+    st.caption(f"{len(orden):,} registros en total.")
     
     # 3. BOTÓN DE DESCARGA (BONUS DE PRODUCTIVIDAD)
-    # Convertimos el DF a CSV
-    csv = df_tabla.to_csv(index=False).encode('utf-8')
-    
-    st.download_button(
-        label="📥 Descargar datos filtrados como CSV",
-        data=csv,
-        file_name='auditoria_ciclovia_2025.csv',
-        mime='text/csv',
-    )
\ No newline at end of file
+    # El CSV se genera solo si el usuario lo pide, no en cada recarga
+    if st.button("📄 Preparar CSV para descargar"):
+        st.session_state.csv_auditoria = (clave_datos, b"".join(stm_datos.exportar_csv(df, orden)))
+    
+    # Los bytes quedan en la sesión solo hasta descargarlos o hasta que cambian los datos
+    csv_auditoria = st.session_state.get("csv_auditoria")
+    if csv_auditoria and csv_auditoria[0] != clave_datos:
+        del st.session_state.csv_auditoria
+    elif csv_auditoria:
+        st.download_button(
+            label="📥 Descargar datos filtrados como CSV",
+            data=csv_auditoria[1],
+            file_name='auditoria_ciclovia.csv',
+            mime='text/csv',
+            on_click=lambda: st.session_state.pop("csv_auditoria", None),
+        )
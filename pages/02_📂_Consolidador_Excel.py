@@ -1,11 +1,25 @@
 import streamlit as st
-import pandas as pd
-import io # Necesario para manejar archivos en la memoria (RAM) sin guardarlos en disco
 from datetime import datetime
+import motor_consolidador
+import cola_trabajos
+
+# Formatos de descarga: extensión -> (nombre visible, tipo MIME)
+FORMATOS_SALIDA = {
+    'xlsx': ("Excel", "application/vnd.ms-excel"),
+    'csv': ("CSV", "text/csv"),
+    'parquet': ("Parquet", "application/octet-stream"),
+}
 
 # CONFIGURACIÓN VISUAL
 st.set_page_config(page_title="Consolidador Pro", page_icon="📂")
 
+# Una sola cola por servidor, compartida por todas las sesiones
+@st.cache_resource
+def obtener_cola():
+    return cola_trabajos.ColaTrabajos()
+
+cola = obtener_cola()
+
 st.title("📂 Consolidador Automático de Excels")
 st.markdown("""
 **Instrucciones:**
@@ -24,66 +38,98 @@ uploaded_files = st.file_uploader(
 if uploaded_files:
     st.info(f"Has subido {len(uploaded_files)} archivos. Listos para procesar.")
     
+    # Modo incremental: los archivos que ya se procesaron antes (mismo contenido) salen del caché
+    incremental = st.checkbox("♻️ Reutilizar archivos ya procesados (modo incremental)", value=True)
+    
+    # Reenvíos y rangos de fechas que se pisan: las ventas que llegan en dos archivos se cuentan una sola vez
+    deduplicar = st.checkbox("🧹 Descartar ventas repetidas entre archivos (reenvíos, rangos que se pisan)")
+    
+    # Modo disco: cada archivo se lee por bloques y pasa por Parquet temporal, nunca entero en RAM
+    en_disco = st.checkbox("💽 Procesar en disco (archivos que no entran en memoria)")
+    
+    # Formato del entregable: Excel para el cliente, CSV/Parquet si el resultado es enorme
+    formato = st.radio("Formato de salida", list(FORMATOS_SALIDA), horizontal=True,
+                       format_func=lambda f: FORMATOS_SALIDA[f][0])
+    
     # Botón de acción para no procesar hasta que el usuario quiera
     if st.button("🚀 Unificar Archivos Ahora"):
+        # 2. PROCESAMIENTO EN SEGUNDO PLANO
+        # El trabajo se encola y corre fuera del script: tocar otro widget ya no lo corta
+        fuentes = [(archivo.name, archivo.getvalue()) for archivo in uploaded_files]
+        dir_cache = motor_consolidador.DIR_CACHE if incremental else None
+        st.session_state.trabajo_id = cola.enviar(fuentes, formato, dir_cache, deduplicar=deduplicar,
+                                                   en_disco=en_disco)
+        # La cola es de todo el servidor: cada sesión solo ve (y descarga) sus propios trabajos
+        st.session_state.setdefault('trabajos_sesion', []).append(st.session_state.trabajo_id)
+
+# 3. SEGUIMIENTO DEL TRABAJO
+# Mientras corre, solo este bloque se refresca cada segundo (sin rerun de toda la página)
+@st.fragment(run_every="1s")
+def progreso_trabajo(id_trabajo):
+    trabajo = cola.estado(id_trabajo)
+    if trabajo['estado'] not in (cola_trabajos.EN_COLA, cola_trabajos.PROCESANDO):
+        st.rerun()  # terminó: redibujamos la página completa para mostrar el resultado
+    
+    avance = trabajo['hechos'] / trabajo['total'] if trabajo['total'] else 0
+    detalle = f"{trabajo['hechos']}/{trabajo['total']} archivos"
+    if trabajo['archivo_actual']:
+        detalle += f" · último: {trabajo['archivo_actual']}"
+    st.progress(avance, text=detalle)
+    st.caption(f"⚡ {trabajo['filas']:,} filas · {trabajo.get('filas_por_seg', 0):,.0f} filas/s")
+
+def resultado_trabajo(trabajo):
+    if trabajo['estado'] == cola_trabajos.ERROR:
+        st.error(f"El trabajo falló: {trabajo['mensaje_error']}")
+        return
+    if trabajo['estado'] == cola_trabajos.INTERRUMPIDO:
+        st.warning("El trabajo se interrumpió (el servidor se reinició). Vuelve a lanzarlo.")
+        return
+
+    for nombre, error in trabajo['errores']:
+        st.error(f"Error en el archivo {nombre}: {error}")
+
+    if trabajo.get('archivos_ok'):
+        st.success(f"✅ ¡Proceso Terminado con Éxito! {trabajo['filas']:,} filas "
+                   f"en {trabajo['segundos']:.1f} s ({trabajo['filas_por_seg']:,.0f} filas/s)")
+        if trabajo.get('duplicados'):
+            st.info(f"🧹 Se descartaron {trabajo['duplicados']:,} filas duplicadas.")
         
-        lista_dfs = []
-        barra_progreso = st.progress(0)
+        # Mostrar una vista previa
+        if trabajo['vista_previa'] is not None:
+            st.subheader("Vista Previa del Resultado:")
+            st.dataframe(trabajo['vista_previa'], use_container_width=True)
+        
+        # Resúmenes para finanzas (en Excel van como hojas extra del mismo archivo)
+        if trabajo.get('resumenes'):
+            st.subheader("📊 Resúmenes")
+            pestanas = st.tabs(list(trabajo['resumenes']))
+            for pestana, tabla in zip(pestanas, trabajo['resumenes'].values()):
+                pestana.dataframe(tabla, use_container_width=True, hide_index=True)
         
-        # 2. PROCESAMIENTO EN MEMORIA
-        for i, archivo_subido in enumerate(uploaded_files):
-            try:
-                # Leemos directo desde la memoria del navegador
-                df_temp = pd.read_excel(archivo_subido)
-                
-                # Agregamos la columna de origen (Auditoría)
-                df_temp['Origen_Archivo'] = archivo_subido.name
-                
-                lista_dfs.append(df_temp)
-                
-                # Actualizar barra de progreso
-                barra_progreso.progress((i + 1) / len(uploaded_files))
-                
-            except Exception as e:
-                st.error(f"Error en el archivo {archivo_subido.name}: {e}")
+        # 4. BOTÓN DE DESCARGA (EL ENTREGABLE)
+        # El archivo vive en disco con el id del trabajo: sobrevive a cualquier rerun
+        formato_trabajo = trabajo['formato']
+        st.download_button(
+            label=f"📥 Descargar {FORMATOS_SALIDA[formato_trabajo][0]} Unificado",
+            data=cola.resultado(trabajo['id']),
+            file_name=f"Reporte_Consolidado_{datetime.fromtimestamp(trabajo['creado']).strftime('%Y%m%d')}.{formato_trabajo}",
+            mime=FORMATOS_SALIDA[formato_trabajo][1],
+        )
 
-        # 3. CONSOLIDACIÓN
-        if lista_dfs:
-            df_final = pd.concat(lista_dfs, ignore_index=True)
-            
-            # --- TUS TRUCOS DE LIMPIEZA ---
-            # 1. Formato de Fechas (Si existe la columna)
-            if 'Fecha' in df_final.columns:
-                 # Convertimos a datetime primero por si acaso
-                df_final['Fecha'] = pd.to_datetime(df_final['Fecha'], errors='coerce')
-                # Formateamos a texto limpio DD/MM/AAAA
-                df_final['Fecha'] = df_final['Fecha'].dt.strftime('%d/%m/%Y')
-            
-            # 2. Relleno de vacíos (Opcional, muy útil para clientes)
-            df_final = df_final.fillna(0) # Pone 0 en lugares vacíos numéricos
-            
-            st.success("✅ ¡Proceso Terminado con Éxito!")
-            
-            # Mostrar una vista previa
-            st.subheader("Vista Previa del Resultado:")
-            st.dataframe(df_final.head(5), use_container_width=True)
-            
-            # 4. BOTÓN DE DESCARGA (EL ENTREGABLE)
-            # Truco de Ingeniero: Guardar en un buffer de memoria, no en disco
-            buffer = io.BytesIO()
-            with pd.ExcelWriter(buffer, engine='xlsxwriter') as writer:
-                df_final.to_excel(writer, index=False, sheet_name='Consolidado')
-                
-                # Auto-ajuste de columnas (Un detalle de lujo)
-                worksheet = writer.sheets['Consolidado']
-                for idx, col in enumerate(df_final.columns):
-                    max_len = max(df_final[col].astype(str).map(len).max(), len(col)) + 2
-                    worksheet.set_column(idx, idx, max_len)
+trabajo_actual = cola.estado(st.session_state.get('trabajo_id'))
+if trabajo_actual:
+    st.divider()
+    if trabajo_actual['estado'] in (cola_trabajos.EN_COLA, cola_trabajos.PROCESANDO):
+        progreso_trabajo(trabajo_actual['id'])
+    else:
+        resultado_trabajo(trabajo_actual)
 
-            # Preparamos el botón
-            st.download_button(
-                label="📥 Descargar Excel Unificado",
-                data=buffer.getvalue(),
-                file_name=f"Reporte_Consolidado_{datetime.now().strftime('%Y%m%d')}.xlsx",
-                mime="application/vnd.ms-excel"
-            )
\ No newline at end of file
+# Trabajos anteriores de esta sesión (por si se lanzó otro antes de descargar el primero)
+with st.expander("🗂️ Trabajos recientes"):
+    for trabajo in cola.listar(st.session_state.get('trabajos_sesion', [])):
+        creado = datetime.fromtimestamp(trabajo['creado']).strftime('%d/%m %H:%M')
+        c_info, c_boton = st.columns([3, 1])
+        c_info.write(f"`{trabajo['id']}` · {creado} · {trabajo['estado']} · {trabajo['filas']:,} filas")
+        if c_boton.button("Ver", key=f"ver_{trabajo['id']}"):
+            st.session_state.trabajo_id = trabajo['id']
+            st.rerun()
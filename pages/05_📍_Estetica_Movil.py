@@ -1,69 +1,150 @@
 import streamlit as st
 import pandas as pd
-import os
-from datetime import datetime, date, time
-import random
-import math
+import numpy as np
+from datetime import datetime, date, time, timedelta
 import folium
-from streamlit_folium import st_folium
+from folium.plugins import FastMarkerCluster
+import streamlit.components.v1 as components
+import estetica_datos
+import lector_excel
+import distancias
+import estetica_rutas
 
 # --- CONFIGURACIÓN DE PÁGINA ---
 st.set_page_config(page_title="Ruta Estética", page_icon="📍", layout="wide")
 
 # --- CONSTANTES ---
-FILE_CLIENTES = "clientes_db.csv"
-FILE_AGENDA = "agenda_db.csv"
-
-# Coordenadas Base (Barrios de Montevideo)
-COORDENADAS_BARRIOS = {
-    "Pocitos": [-34.908, -56.145],
-    "Carrasco": [-34.885, -56.058],
-    "Centro": [-34.905, -56.190],
-    "Malvín": [-34.895, -56.110],
-    "Punta Carretas": [-34.920, -56.160],
-    "Cordón": [-34.900, -56.170],
-    "Prado": [-34.855, -56.200],
-    "Buceo": [-34.900, -56.130],
-    "Ciudad Vieja": [-34.907, -56.205],
-    "Parque Batlle": [-34.895, -56.155],
-    "Tres Cruces": [-34.892, -56.165],
-    "Punta Gorda": [-34.890, -56.090],
-    "La Blanqueada": [-34.880, -56.150]
-}
+# Coordenadas Base (Barrios de Montevideo): el nomenclátor vive en estetica_datos
+COORDENADAS_BARRIOS = estetica_datos.BARRIOS
 
 # --- FUNCIONES AUXILIARES ---
 
-def obtener_coordenadas(barrio):
-    """Devuelve lat/lon con ruido aleatorio para no superponer puntos."""
-    lat, lon = COORDENADAS_BARRIOS.get(barrio, [-34.90, -56.16])
-    lat += random.uniform(-0.002, 0.002)
-    lon += random.uniform(-0.002, 0.002)
-    return lat, lon
-
-def calcular_km(lat1, lon1, lat2, lon2):
-    """Fórmula Haversine para distancia real en KM."""
-    R = 6371.0
-    dlat = math.radians(lat2 - lat1)
-    dlon = math.radians(lon2 - lon1)
-    a = math.sin(dlat / 2)**2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlon / 2)**2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-    return round(R * c, 1)
-
-def cargar_datos(archivo, columnas):
-    if os.path.exists(archivo):
-        df = pd.read_csv(archivo)
-        if "Fecha" in df.columns: df["Fecha"] = df["Fecha"].astype(str)
-        return df
-    return pd.DataFrame(columns=columnas)
+def coordenadas_cliente(row):
+    """Coordenadas fijas del cliente (geocodificadas al darlo de alta); si faltan, el centro de su zona."""
+    if pd.notna(row["lat"]) and pd.notna(row["lon"]):
+        return float(row["lat"]), float(row["lon"])
+    return tuple(COORDENADAS_BARRIOS.get(row["Zona"], estetica_datos.CENTRO_CIUDAD))
+
+@st.cache_resource
+def preparar_base():
+    """Crea la base SQLite (y migra los CSV viejos) una sola vez por servidor."""
+    return estetica_datos.inicializar()
+
+@st.cache_resource(max_entries=1)
+def indice_nombres(version_clientes):
+    """Índice de clientes por nombre (búsqueda y fila en O(1)); se rearma solo cuando hay altas.
+
+    Solo vive el de la última versión: los de versiones viejas no se vuelven a pedir.
+    """
+    return estetica_datos.IndiceClientes(estetica_datos.cargar_clientes())
+
+@st.cache_data(show_spinner=False)
+def profesionales_cacheados(version_profesionales):
+    return estetica_datos.cargar_profesionales()
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def plan_equipo(fecha_iso, version_agenda, version_profesionales):
+    """Reparto de los turnos del día entre el equipo (se recalcula solo si cambian los datos)."""
+    return estetica_rutas.planificar_equipo(estetica_datos.agenda_del_dia(fecha_iso),
+                                            estetica_datos.cargar_profesionales())
+
+@st.cache_resource(max_entries=1)
+def indice_clientes(version_clientes, _df_clientes):
+    """Índice espacial de la base de clientes; se rearma solo cuando hay altas (y reemplaza al anterior)."""
+    coords = [coordenadas_cliente(row) for _, row in _df_clientes.iterrows()]
+    return distancias.IndiceEspacial([c[0] for c in coords], [c[1] for c in coords])
+
+def usar_horario(fecha_iso, hora):
+    """Callback de las sugerencias: lleva fecha y hora a los inputs antes del rerun."""
+    st.session_state.fecha_agenda = date.fromisoformat(fecha_iso)
+    st.session_state.hora_temporal = time.fromisoformat(hora)
+
+# --- MAPAS (cacheados) ---
+# Armar un folium.Map y serializarlo es lo más caro de la página. El HTML de cada mapa se
+# guarda por (fecha, base, versión de la agenda): si no hubo altas, un rerun no lo rearma.
+# Con muchos puntos no se crea un Marker por turno: van en una sola capa GeoJSON o en un
+# cluster que arma los marcadores en el navegador.
+
+MAX_MARCADORES = 40  # más turnos que esto en un día -> capa GeoJSON en vez de Markers
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def plan_del_dia(fecha_iso, base, version_agenda):
+    ruta = estetica_datos.agenda_del_dia(fecha_iso)
+    lat_b, lon_b = COORDENADAS_BARRIOS[base]
+    return estetica_rutas.optimizar_ruta(ruta, lat_b, lon_b)
+
+def recorrido_del_dia(ruta, plan, usar_optimo):
+    if usar_optimo:
+        return ruta.iloc[plan["orden"]].assign(Llegada=plan["llegadas"])
+    return ruta
+
+def _geojson_puntos(df, etiqueta):
+    return {
+        "type": "FeatureCollection",
+        "features": [
+            {"type": "Feature", "geometry": {"type": "Point", "coordinates": [lon, lat]},
+             "properties": {"etiqueta": texto}}
+            for lat, lon, texto in zip(df["lat"], df["lon"], etiqueta)
+        ],
+    }
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def mapa_dia(fecha_iso, base, version_agenda, usar_optimo):
+    """HTML del mapa de un día: base, turnos numerados en orden de visita y la ruta."""
+    ruta = estetica_datos.agenda_del_dia(fecha_iso)
+    lat_b, lon_b = COORDENADAS_BARRIOS[base]
+    recorrido = recorrido_del_dia(ruta, plan_del_dia(fecha_iso, base, version_agenda), usar_optimo)
+    
+    m = folium.Map(location=[ruta["lat"].mean(), ruta["lon"].mean()], zoom_start=13)
+    folium.Marker(
+        [lat_b, lon_b], 
+        popup="Base", tooltip="Inicio",
+        icon=folium.Icon(color="blue", icon="home", prefix="fa")
+    ).add_to(m)
+    
+    etiquetas = [f"{n}. {h} - {c}" for n, (h, c) in enumerate(zip(recorrido["Hora"], recorrido["Cliente"]), start=1)]
+    if len(recorrido) <= MAX_MARCADORES:
+        for n, (lat, lon, etiqueta) in enumerate(zip(recorrido["lat"], recorrido["lon"], etiquetas), start=1):
+            folium.Marker(
+                [lat, lon], popup=etiqueta, tooltip=etiqueta,
+                icon=folium.Icon(color="red", icon=str(n), prefix="fa")
+            ).add_to(m)
+    else:
+        folium.GeoJson(
+            _geojson_puntos(recorrido, etiquetas),
+            marker=folium.CircleMarker(radius=6, color="red", fill=True, fill_opacity=0.8),
+            tooltip=folium.GeoJsonTooltip(fields=["etiqueta"], labels=False),
+        ).add_to(m)
+    
+    puntos_linea = [[lat_b, lon_b]] + recorrido[["lat", "lon"]].values.tolist()
+    folium.PolyLine(puntos_linea, color="blue", weight=2.5, opacity=0.8).add_to(m)
+    return m.get_root().render()
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def mapa_periodo(desde_iso, hasta_iso, base, version_agenda):
+    """HTML con todos los turnos del período en clusters, y la cantidad de turnos por día."""
+    agenda = estetica_datos.agenda_entre(desde_iso, hasta_iso).dropna(subset=["lat", "lon"])
+    por_dia = agenda.groupby("Fecha").size().rename("Turnos").reset_index()
+    lat_b, lon_b = COORDENADAS_BARRIOS[base]
+    
+    m = folium.Map(location=[lat_b, lon_b], zoom_start=12)
+    folium.Marker([lat_b, lon_b], tooltip="Base", icon=folium.Icon(color="blue", icon="home", prefix="fa")).add_to(m)
+    # FastMarkerCluster manda solo las coordenadas: los marcadores se crean en el navegador
+    datos = [[lat, lon, f"{f} {h} - {c}"] for lat, lon, f, h, c in
+             zip(agenda["lat"], agenda["lon"], agenda["Fecha"], agenda["Hora"], agenda["Cliente"])]
+    FastMarkerCluster(datos, callback="""
+        function (fila) {
+            return L.marker(new L.LatLng(fila[0], fila[1])).bindTooltip(fila[2]);
+        }""").add_to(m)
+    return m.get_root().render(), por_dia
 
 # --- CEREBRO DE LA APP: ANÁLISIS DE CONVENIENCIA ---
-def analizar_conveniencia(df_agenda, cliente_zona, hora_propuesta, lat_base, lon_base):
-    lat_cliente, lon_cliente = COORDENADAS_BARRIOS.get(cliente_zona, [-34.90, -56.16])
+def analizar_conveniencia(df_agenda, lat_cliente, lon_cliente, hora_propuesta, lat_base, lon_base):
     hora_str = str(hora_propuesta)[:5] # HH:MM
     
     # 1. Si la agenda está vacía, comparamos con CASA
     if df_agenda.empty:
-        dist = calcular_km(lat_base, lon_base, lat_cliente, lon_cliente)
+        dist = round(distancias.distancia_km(lat_base, lon_base, lat_cliente, lon_cliente), 1)
         return {
             "color": "green" if dist < 8 else "orange",
             "titulo": "Primer Turno",
@@ -74,6 +155,13 @@ def analizar_conveniencia(df_agenda, cliente_zona, hora_propuesta, lat_base, lon
     # 2. Ordenar agenda
     agenda = df_agenda.sort_values("Hora").copy()
     
+    # Distancia del cliente a la base y a cada turno del día, en una sola cuenta
+    lats = [lat_base] + agenda["lat"].tolist()
+    lons = [lon_base] + agenda["lon"].tolist()
+    dist_cliente = distancias.matriz_km([lat_cliente], [lon_cliente], lats, lons)[0].round(1)
+    dist_casa = dist_cliente[0]
+    agenda["dist"] = dist_cliente[1:]
+    
     # Buscar citas ANTES y DESPUÉS
     citas_antes = agenda[agenda["Hora"] <= hora_str]
     cita_prev = citas_antes.iloc[-1] if not citas_antes.empty else None
@@ -83,15 +171,14 @@ def analizar_conveniencia(df_agenda, cliente_zona, hora_propuesta, lat_base, lon
 
     # CASO A: Es el primer turno
     if cita_prev is None:
-        dist_casa = calcular_km(lat_base, lon_base, lat_cliente, lon_cliente)
         if cita_next is not None:
-            dist_sig = calcular_km(lat_cliente, lon_cliente, cita_next['lat'], cita_next['lon'])
+            dist_sig = cita_next['dist']
             if dist_sig > 10:
                 return {"color": "red", "titulo": "Desvío Grande", "mensaje": f"Te alejas {dist_sig} km de tu siguiente cliente.", "icono": "🛑"}
         return {"color": "green", "titulo": "Buen Comienzo", "mensaje": f"Inicio de ruta. A {dist_casa} km de casa.", "icono": "🚀"}
 
     # CASO B: Hay un turno ANTERIOR
-    dist_anterior = calcular_km(cita_prev['lat'], cita_prev['lon'], lat_cliente, lon_cliente)
+    dist_anterior = cita_prev['dist']
     origen = f"{cita_prev['Cliente']} en {cita_prev['Zona']}"
     
     if dist_anterior < 4:
@@ -110,16 +197,17 @@ with st.sidebar:
     mi_base = st.selectbox("Tu Base (Casa)", list(COORDENADAS_BARRIOS.keys()), index=3) # Default Malvín
     lat_base, lon_base = COORDENADAS_BARRIOS[mi_base]
     st.divider()
-    fecha_seleccionada = st.date_input("Fecha de Agenda:", date.today())
+    if 'fecha_agenda' not in st.session_state:
+        st.session_state.fecha_agenda = date.today()
+    fecha_seleccionada = st.date_input("Fecha de Agenda:", key="fecha_agenda")
     
-    # Cargar Datos
-    df_clientes = cargar_datos(FILE_CLIENTES, ["Nombre", "Zona", "Contacto", "Notas Técnicas"])
-    df_agenda = cargar_datos(FILE_AGENDA, ["Fecha", "Hora", "Cliente", "Zona", "Servicio", "lat", "lon", "Estado"])
-    
-    if not df_agenda.empty:
-        ruta_del_dia = df_agenda[df_agenda["Fecha"] == str(fecha_seleccionada)].sort_values("Hora")
-    else:
-        ruta_del_dia = pd.DataFrame()
+    # Cargar Datos (de la agenda solo el día elegido: la consulta usa el índice Fecha/Hora)
+    preparar_base()
+    version_clientes, version_agenda, version_profesionales = estetica_datos.version()
+    df_profesionales = profesionales_cacheados(version_profesionales)
+    clientes = indice_nombres(version_clientes)
+    df_clientes = clientes.df
+    ruta_del_dia = estetica_datos.agenda_del_dia(fecha_seleccionada)
     
     st.metric("Turnos Hoy", len(ruta_del_dia))
 
@@ -141,7 +229,13 @@ with tab1:
             st.error("⚠️ Carga clientes primero.")
             cliente_select = None
         else:
-            cliente_select = st.selectbox("¿Quién llama?", df_clientes["Nombre"].unique())
+            busqueda = st.text_input("¿Quién llama?", placeholder="Escribe parte del nombre...")
+            opciones = clientes.buscar(busqueda)
+            if opciones:
+                cliente_select = st.selectbox("Cliente", opciones, label_visibility="collapsed")
+            else:
+                st.caption("Sin coincidencias.")
+                cliente_select = None
         
         # 2. HORA (Input + Botones Rápidos)
         # Usamos session_state para que los botones actualicen el input
@@ -167,23 +261,52 @@ with tab1:
             st.session_state.hora_temporal = time(17, 0)
             st.rerun()
 
+        # 3. MEJORES HORARIOS: todos los huecos libres se evalúan de una vez
+        if cliente_select:
+            with st.expander("🔎 Buscar el mejor horario"):
+                dias_busqueda = st.number_input("Días a revisar (desde la fecha elegida)", min_value=1, max_value=14, value=1)
+                if st.button("Buscar huecos"):
+                    lat_c, lon_c = coordenadas_cliente(clientes.fila(cliente_select))
+                    fechas = [fecha_seleccionada + timedelta(days=i) for i in range(dias_busqueda)]
+                    agenda_rango = estetica_datos.agenda_entre(fechas[0], fechas[-1])
+                    st.session_state.sugerencias = (cliente_select, estetica_rutas.mejores_horarios(
+                        agenda_rango, fechas, lat_c, lon_c, lat_base, lon_base))
+                
+                cliente_sug, sugerencias = st.session_state.get('sugerencias', (None, None))
+                if cliente_sug == cliente_select and sugerencias is not None:
+                    if sugerencias.empty:
+                        st.caption("No hay huecos libres en esos días.")
+                    for i, sug in enumerate(sugerencias.head(5).itertuples(index=False)):
+                        etiqueta = (f"{date.fromisoformat(sug.Fecha).strftime('%d/%m')} {sug.Hora} · "
+                                    f"+{sug[2]} km ({sug[3]} → {sug[4]})")
+                        st.button(etiqueta, key=f"sugerencia_{i}", on_click=usar_horario, args=(sug.Fecha, sug.Hora))
+
         st.write("")
         st.markdown("---")
         
         # BOTÓN CONFIRMAR
         if cliente_select:
-            row_c = df_clientes[df_clientes["Nombre"] == cliente_select].iloc[0]
+            row_c = clientes.fila(cliente_select)
             zona_c = row_c["Zona"]
             
+            # Con equipo: se sugiere la profesional a la que menos le cuesta sumar este turno
+            profesional = None
+            if not df_profesionales.empty:
+                lat_c, lon_c = coordenadas_cliente(row_c)
+                opciones_prof = estetica_rutas.asignar_profesional(ruta_del_dia, df_profesionales, lat_c, lon_c, hora_input)
+                profesional = st.selectbox(
+                    "Profesional", opciones_prof["Profesional"],
+                    format_func=lambda n: f"{n} (+{opciones_prof.set_index('Profesional').loc[n, 'Km Extra']} km)")
+            
             if st.button("📅 CONFIRMAR TURNO", type="primary", use_container_width=True):
-                lat, lon = obtener_coordenadas(zona_c)
+                lat, lon = coordenadas_cliente(row_c)
                 nuevo = {
                     "Fecha": str(fecha_seleccionada), 
                     "Hora": str(hora_input)[:5], 
                     "Cliente": cliente_select, "Zona": zona_c, "Servicio": "Corte",
-                    "lat": lat, "lon": lon, "Estado": "Pendiente"
+                    "lat": lat, "lon": lon, "Estado": "Pendiente", "Profesional": profesional
                 }
-                pd.concat([df_agenda, pd.DataFrame([nuevo])], ignore_index=True).to_csv(FILE_AGENDA, index=False)
+                estetica_datos.agregar_turno(nuevo)
                 st.toast("Turno Agendado con éxito", icon="💾")
                 st.rerun()
 
@@ -192,9 +315,10 @@ with tab1:
         st.subheader("🤖 Análisis de Rentabilidad")
         
         if cliente_select:
-            row_c = df_clientes[df_clientes["Nombre"] == cliente_select].iloc[0]
+            row_c = clientes.fila(cliente_select)
             zona_c = row_c["Zona"]
-            resultado = analizar_conveniencia(ruta_del_dia, zona_c, hora_input, lat_base, lon_base)
+            lat_c, lon_c = coordenadas_cliente(row_c)
+            resultado = analizar_conveniencia(ruta_del_dia, lat_c, lon_c, hora_input, lat_base, lon_base)
             
             color_fondo = resultado["color"]
             emoji = resultado["icono"]
@@ -207,6 +331,14 @@ with tab1:
                 st.markdown(f"### {emoji} {resultado['titulo']}")
                 c_box(resultado["mensaje"])
                 st.caption(f"📍 Zona del cliente: **{zona_c}**")
+                
+                # Turnos de ese día cerca del cliente (consulta al índice espacial)
+                if not ruta_del_dia.empty:
+                    indice_dia = distancias.IndiceEspacial(ruta_del_dia["lat"], ruta_del_dia["lon"])
+                    cercanos, _ = indice_dia.cerca(lat_c, lon_c, 2.0)
+                    if len(cercanos):
+                        horas_cerca = ", ".join(ruta_del_dia["Hora"].iloc[cercanos].sort_values())
+                        st.caption(f"📌 {len(cercanos)} turno(s) a menos de 2 km ese día: {horas_cerca}")
         else:
             st.info("Selecciona un cliente.")
 
@@ -267,50 +399,112 @@ with tab2:
             st.write("**Nuevo Cliente**")
             nombre = st.text_input("Nombre")
             zona = st.selectbox("Zona", list(COORDENADAS_BARRIOS.keys()))
+            direccion = st.text_input("Dirección")
             contacto = st.text_input("Contacto")
             notas = st.text_area("Ficha Técnica")
             if st.form_submit_button("Guardar"):
                 if nombre:
-                    nuevo = pd.DataFrame([{"Nombre": nombre, "Zona": zona, "Contacto": contacto, "Notas Técnicas": notas}])
-                    pd.concat([df_clientes, nuevo], ignore_index=True).to_csv(FILE_CLIENTES, index=False)
+                    estetica_datos.agregar_cliente({"Nombre": nombre, "Zona": zona, "Direccion": direccion,
+                                                    "Contacto": contacto, "Notas Técnicas": notas})
                     st.rerun()
                 else: st.error("Falta nombre.")
+        
+        # Alta masiva: las direcciones se geocodifican todas juntas (y quedan en caché)
+        with st.expander("📥 Importar clientes desde planilla"):
+            st.caption("Columnas: Nombre, Zona, Dirección (opcional), Contacto, Notas Técnicas")
+            planilla = st.file_uploader("CSV o Excel", type=["csv", "xlsx"])
+            if planilla and st.button("Importar"):
+                if planilla.name.endswith(".csv"):
+                    nuevos = pd.read_csv(planilla)
+                else:
+                    nuevos = lector_excel.leer_excel(planilla)
+                nuevos = nuevos.rename(columns={"Dirección": "Direccion"})
+                nuevos = nuevos[nuevos["Nombre"].notna()] if "Nombre" in nuevos.columns else nuevos.iloc[0:0]
+                cantidad = estetica_datos.importar_clientes(nuevos)
+                st.toast(f"{cantidad} clientes importados", icon="📥")
+                st.rerun()
     with c2:
         st.dataframe(df_clientes, hide_index=True, use_container_width=True)
+    
+    # Equipo: cada profesional con su base, para repartir los turnos del día
+    st.subheader("👩‍🎨 Equipo")
+    e1, e2 = st.columns(2)
+    with e1:
+        with st.form("alta_profesional", clear_on_submit=True):
+            nombre_prof = st.text_input("Nombre de la profesional")
+            base_prof = st.selectbox("Base", list(COORDENADAS_BARRIOS.keys()))
+            if st.form_submit_button("Agregar al equipo"):
+                if nombre_prof and nombre_prof not in set(df_profesionales["Nombre"]):
+                    estetica_datos.agregar_profesional(nombre_prof, base_prof)
+                    st.rerun()
+                else: st.error("Falta el nombre o ya existe.")
+    with e2:
+        st.dataframe(df_profesionales[["Nombre", "Zona"]], hide_index=True, use_container_width=True)
 
 # ==============================================================================
 # TAB 3: MAPA DE EJECUCIÓN
 # ==============================================================================
 with tab3:
-    st.subheader(f"Mapa del {fecha_seleccionada.strftime('%d/%m')}")
+    vista = st.radio("Vista", ["Día", "Semana", "Mes"], horizontal=True)
+    
+    if vista != "Día":
+        # Panorama de varios días: todos los turnos agrupados en clusters
+        if vista == "Semana":
+            desde, hasta = fecha_seleccionada, fecha_seleccionada + timedelta(days=6)
+        else:
+            desde = fecha_seleccionada.replace(day=1)
+            hasta = (desde + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+        st.subheader(f"Turnos del {desde.strftime('%d/%m')} al {hasta.strftime('%d/%m')}")
+        html, por_dia = mapa_periodo(str(desde), str(hasta), mi_base, version_agenda)
+        if por_dia.empty:
+            st.info("No hay turnos en ese período.")
+        else:
+            components.html(html, height=500)
+            st.bar_chart(por_dia, x="Fecha", y="Turnos")
     
-    if not ruta_del_dia.empty:
-        avg_lat = ruta_del_dia["lat"].mean()
-        avg_lon = ruta_del_dia["lon"].mean()
-        m = folium.Map(location=[avg_lat, avg_lon], zoom_start=13)
+    elif not ruta_del_dia.empty:
+        st.subheader(f"Mapa del {fecha_seleccionada.strftime('%d/%m')}")
+        # Orden de visita sugerido (menos km respetando las horas pactadas)
+        plan = plan_del_dia(str(fecha_seleccionada), mi_base, version_agenda)
+        usar_optimo = st.toggle("🧭 Ver orden optimizado", value=True)
+        k1, k2, k3 = st.columns(3)
+        k1.metric("Km en orden por hora", f"{plan['km_original']:.1f}")
+        k2.metric("Km optimizado", f"{plan['km_optimo']:.1f}", delta=f"{-plan['km_ahorrados']:.1f} km", delta_color="inverse")
+        k3.metric("Retraso estimado", f"{plan['retraso_min']:.0f} min")
         
-        # Base
-        folium.Marker(
-            [lat_base, lon_base], 
-            popup="Base", tooltip="Inicio",
-            icon=folium.Icon(color="blue", icon="home", prefix="fa")
-        ).add_to(m)
+        recorrido = recorrido_del_dia(ruta_del_dia, plan, usar_optimo)
+        components.html(mapa_dia(str(fecha_seleccionada), mi_base, version_agenda, usar_optimo), height=500)
         
-        # Ruta
-        puntos_linea = [[lat_base, lon_base]]
-        contador = 1
+        if usar_optimo:
+            st.dataframe(recorrido[["Llegada", "Hora", "Cliente", "Zona"]], hide_index=True, use_container_width=True)
         
-        for i, row in ruta_del_dia.iterrows():
-            folium.Marker(
-                [row['lat'], row['lon']], 
-                popup=f"{row['Hora']} - {row['Cliente']}",
-                tooltip=f"{contador}. {row['Cliente']}",
-                icon=folium.Icon(color="red", icon=str(contador), prefix="fa")
-            ).add_to(m)
-            puntos_linea.append([row['lat'], row['lon']])
-            contador += 1
-            
-        folium.PolyLine(puntos_linea, color="blue", weight=2.5, opacity=0.8).add_to(m)
-        st_folium(m, width=800, height=500)
+        # Reparto entre varias profesionales (cada una desde su base)
+        if len(df_profesionales) >= 2:
+            with st.expander("👥 Repartir el día entre el equipo"):
+                reparto = plan_equipo(str(fecha_seleccionada), version_agenda, version_profesionales)
+                r1, r2 = st.columns(2)
+                r1.metric("Km del reparto sugerido", f"{reparto['km_total']:.1f}")
+                if reparto["km_actual"] is not None:
+                    r2.metric("Km del reparto actual", f"{reparto['km_actual']:.1f}",
+                              delta=f"{reparto['km_total'] - reparto['km_actual']:.1f} km", delta_color="inverse")
+                st.dataframe(reparto["resumen"], hide_index=True, use_container_width=True)
+                st.dataframe(reparto["agenda"][["Profesional", "Llegada", "Hora", "Cliente", "Zona"]],
+                             hide_index=True, use_container_width=True)
+                if st.button("💾 Guardar este reparto"):
+                    estetica_datos.asignar_turnos(reparto["agenda"])
+                    st.toast("Turnos reasignados", icon="👥")
+                    st.rerun()
+        
+        # Clientes cerca del recorrido que hoy no tienen turno: candidatos para llenar huecos
+        st.markdown("##### 🧲 Clientes cerca de la ruta")
+        radio = st.slider("Radio (km)", 0.5, 5.0, 1.5, step=0.5)
+        indice = indice_clientes(version_clientes, df_clientes)
+        cercanos, dist_ruta = indice.cerca_de_ruta(np.r_[lat_base, recorrido["lat"]], np.r_[lon_base, recorrido["lon"]], radio)
+        candidatos = df_clientes.iloc[cercanos].assign(**{"Km a la ruta": dist_ruta.round(1)})
+        candidatos = candidatos[~candidatos["Nombre"].isin(ruta_del_dia["Cliente"])]
+        if candidatos.empty:
+            st.caption("No hay otros clientes cerca de esta ruta.")
+        else:
+            st.dataframe(candidatos[["Nombre", "Zona", "Contacto", "Km a la ruta"]], hide_index=True, use_container_width=True)
     else:
-        st.info("Agenda vacía. No hay ruta para mostrar.")
\ No newline at end of file
+        st.info("Agenda vacía. No hay ruta para mostrar.")
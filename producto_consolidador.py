@@ -1,58 +1,71 @@
-import pandas as pd
 import glob # Librería nativa para buscar archivos como un sabueso
-import os
-
-print("🤖 Iniciando el Consolidador Automático...")
-
-# 1. BUSCAR LOS ARCHIVOS
-# El *.xlsx significa "cualquier cosa que termine en Excel"
-ruta_busqueda = 'archivos_cliente/*.xlsx'
-archivos_encontrados = glob.glob(ruta_busqueda)
-
-print(f"📂 Archivos detectados: {len(archivos_encontrados)}")
-print(archivos_encontrados)
-
-# 2. PROCESO DE FUSIÓN (EL BUCLE MÁGICO)
-lista_de_dataframes = []
-
-for archivo in archivos_encontrados:
-    print(f"   -> Leyendo: {archivo}...")
-    try:
-        # Leemos el excel
-        df_temporal = pd.read_excel(archivo)
-        
-        # Opcional: Agregar el nombre del archivo por si el cliente se olvidó de poner la sucursal
-        nombre_archivo = os.path.basename(archivo)
-        df_temporal['Origen_Archivo'] = nombre_archivo
-        
-        # Lo guardamos en la lista
-        lista_de_dataframes.append(df_temporal)
-    except Exception as e:
-        print(f"❌ Error leyendo {archivo}: {e}")
-
-# 3. CONSOLIDACIÓN FINAL
-if lista_de_dataframes:
-    df_maestro = pd.concat(lista_de_dataframes, ignore_index=True)
-    
-    # --- EL TRUCO DE SENIOR ---
-    # Convertimos la fecha "científica" a fecha "humana" (DD/MM/AAAA)
-    # Esto asegura que en el Excel final se vea perfecto, sin horas 00:00:00
-    print("💅 Maquillando las fechas para el cliente...")
-    
-    # Verificamos si existe la columna Fecha antes de intentar formatearla
-    if 'Fecha' in df_maestro.columns:
-        # dt.strftime es "Date Time String Format"
-        df_maestro['Fecha'] = df_maestro['Fecha'].dt.strftime('%d/%m/%Y')
-
-    # 4. GUARDAR EL RESULTADO
-    nombre_salida = 'REPORTE_CONSOLIDADO_GLOBAL.xlsx'
-    df_maestro.to_excel(nombre_salida, index=False)
-    
+import argparse
+import motor_consolidador # El motor compartido con la página del Consolidador
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Unifica los Excel de archivos_cliente/ en un reporte maestro.")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Reutiliza los archivos ya procesados y solo parsea los nuevos o modificados.")
+    parser.add_argument("--formato", choices=list(motor_consolidador.SUMIDEROS), default="xlsx",
+                        help="Formato del reporte (csv/parquet convienen para resultados muy grandes).")
+    parser.add_argument("--deduplicar", action="store_true",
+                        help="Descarta filas de venta que ya llegaron en otro archivo (reenvíos, rangos de fechas que se pisan).")
+    parser.add_argument("--en-disco", action="store_true",
+                        help="Para archivos que no entran en memoria: se leen por bloques y pasan por Parquet temporal.")
+    args = parser.parse_args()
+
+    print("🤖 Iniciando el Consolidador Automático...")
+
+    # 1. BUSCAR LOS ARCHIVOS
+    # El *.xlsx significa "cualquier cosa que termine en Excel"
+    ruta_busqueda = 'archivos_cliente/*.xlsx'
+    archivos_encontrados = glob.glob(ruta_busqueda)
+
+    print(f"📂 Archivos detectados: {len(archivos_encontrados)}")
+    print(archivos_encontrados)
+
+    if not archivos_encontrados:
+        print("⚠️ No se encontraron archivos para unir.")
+        return
+
+    # 2. PROCESO DE FUSIÓN (EN PARALELO)
+    # Cada archivo se lee en su propio proceso y se escribe en el reporte apenas termina,
+    # sin juntar todas las tablas en memoria. Columnas y tipos se unifican antes de empezar.
+    def avisar(hechos, total, nombre):
+        print(f"   -> [{hechos}/{total}] Listo: {nombre}")
+
+    nombre_salida = f'REPORTE_CONSOLIDADO_GLOBAL.{args.formato}'
+    sumidero = motor_consolidador.SUMIDEROS[args.formato](nombre_salida)
+    dir_cache = motor_consolidador.DIR_CACHE if args.incremental else None
+    resumen = motor_consolidador.consolidar(archivos_encontrados, sumidero, al_avanzar=avisar, dir_cache=dir_cache,
+                                            deduplicar=args.deduplicar, en_disco=args.en_disco)
+    if args.incremental:
+        print(f"♻️  Reutilizados del caché: {resumen['desde_cache']} de {len(archivos_encontrados)}")
+
+    if args.deduplicar:
+        print(f"🧹 Filas duplicadas descartadas: {resumen['duplicados']}")
+        reporte = resumen['resumenes']['Duplicados']
+        for fila in reporte[reporte['Duplicados'] > 0].itertuples(index=False):
+            print(f"   -> {fila.Archivo}: {fila.Duplicados} de {fila.Filas} filas (coinciden con {fila[3]})")
+
+    for nombre, error in resumen['errores']:
+        print(f"❌ Error leyendo {nombre}: {error}")
+
+    # 3. RESULTADO
     print("\n" + "="*40)
     print(f"✅ ¡LISTO! Se generó: {nombre_salida}")
-    print(f"📊 Total de filas procesadas: {len(df_maestro)}")
-    print(f"💰 Suma total de ventas: ${df_maestro['Monto'].sum():,.0f}")
+    print(f"📊 Total de filas procesadas: {resumen['filas']}")
+    print(f"💰 Suma total de ventas: ${resumen['monto_total']:,.0f}")
     print("="*40)
-    
-else:
-    print("⚠️ No se encontraron archivos para unir.")
\ No newline at end of file
+
+    # 4. RESÚMENES (en el Excel van como hojas extra)
+    por_sucursal = resumen['resumenes'].get('Por Sucursal')
+    if por_sucursal is not None:
+        print("\n🏪 Ventas por sucursal:")
+        print(por_sucursal.to_string(index=False))
+
+
+# El guard es obligatorio: los procesos del pool vuelven a importar este archivo
+if __name__ == "__main__":
+    main()
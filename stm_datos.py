@@ -0,0 +1,471 @@
+import os
+import shutil
+import json
+import time
+import logging
+import urllib.parse
+import requests
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+import pyarrow.dataset as ds
+
+# Rendimiento de parseo e ingesta (filas/s): va al log, no a la salida de la página
+log = logging.getLogger(__name__)
+
+# --- CONSTANTES ---
+URL_CICLOVIA = "https://ckan-data.montevideo.gub.uy/dataset/15a3de29-2353-4d5f-9bae-e1617fa9e974/resource/6ada7fb7-cd03-4752-8b73-ef083df739aa/download/conteo_ciclovia_2025.csv"
+
+# Carpeta local donde guardamos el CSV crudo y la "foto" columnar ya procesada
+DIR_CACHE = os.path.join(".cache", "stm")
+
+# Si cambia la lógica de normalización, subimos la versión y se regenera la foto
+VERSION_FORMATO = 2
+
+# Lectura por bloques: filas por bloque y tipos fijos (sin inferencia de pandas)
+TAMANO_BLOQUE = 500_000
+COLUMNAS_CONTEO = ['hacia_ciudad_vieja', 'hacia_tres_cruces']
+FORMATO_FECHA = '%d/%m/%Y'
+
+
+# --- FUNCIONES AUXILIARES ---
+
+def _leer_meta(ruta_meta):
+    if os.path.exists(ruta_meta):
+        with open(ruta_meta, encoding="utf-8") as f:
+            return json.load(f)
+    return {}
+
+def _guardar_meta(ruta_meta, meta):
+    with open(ruta_meta, "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+
+def descargar_csv(url, dir_cache=DIR_CACHE, timeout=30):
+    """Baja el CSV una sola vez y después solo revalida con ETag/Last-Modified.
+
+    Si el portal no responde y ya tenemos una copia local, seguimos con ella.
+    Devuelve la ruta del CSV crudo en disco.
+    """
+    os.makedirs(dir_cache, exist_ok=True)
+    nombre = os.path.basename(url.split("?")[0]) or "datos.csv"
+    ruta_csv = os.path.join(dir_cache, nombre)
+    ruta_meta = ruta_csv + ".json"
+    meta = _leer_meta(ruta_meta)
+
+    headers = {}
+    if os.path.exists(ruta_csv):
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+    try:
+        resp = requests.get(url, headers=headers, timeout=timeout, stream=True)
+        if resp.status_code == 304:
+            return ruta_csv
+        resp.raise_for_status()
+
+        # Escribimos a un temporal y renombramos: nunca queda un CSV a medio bajar
+        ruta_tmp = ruta_csv + ".tmp"
+        with open(ruta_tmp, "wb") as f:
+            for bloque in resp.iter_content(chunk_size=1 << 20):
+                f.write(bloque)
+        os.replace(ruta_tmp, ruta_csv)
+
+        _guardar_meta(ruta_meta, {
+            "url": url,
+            "etag": resp.headers.get("ETag"),
+            "last_modified": resp.headers.get("Last-Modified"),
+        })
+    except requests.RequestException:
+        # Portal lento o sin red: si hay copia local la usamos, si no, no hay nada que hacer
+        if not os.path.exists(ruta_csv):
+            raise
+    return ruta_csv
+
+def _desde_categorias(serie, parsear, vacio):
+    """Parsea solo los valores únicos de una columna categórica y expande por código."""
+    serie = serie.astype('category')
+    valores = parsear(serie.cat.categories)
+    # El código -1 (faltante) cae en el último elemento, que es el valor "vacío"
+    valores = np.append(np.asarray(valores), vacio)
+    return valores[serie.cat.codes.to_numpy()]
+
+def _parsear_fechas(categorias):
+    fechas = pd.to_datetime(categorias, format=FORMATO_FECHA, errors='coerce')
+    if fechas.isna().all():
+        # Formato distinto al esperado: probamos inferencia, pero solo sobre los únicos
+        fechas = pd.to_datetime(categorias, dayfirst=True, errors='coerce')
+    return fechas.to_numpy(dtype='datetime64[ns]')
+
+def _parsear_horas(categorias):
+    horas = pd.to_numeric(pd.Series(categorias.astype(str)).str.partition(':')[0], errors='coerce')
+    return np.nan_to_num(horas, nan=-1).astype(np.int8)
+
+def normalizar(df):
+    """Limpia columnas y precalcula fecha_dt, hora_num y total_bicis.
+
+    Fecha y hora se tratan como categóricas: se parsean los pocos valores únicos
+    (días del año, horas del día) y se expanden por código, sin recorrer strings fila a fila.
+    hora_num queda en int8 con -1 para horas ilegibles.
+    """
+    df.columns = df.columns.str.strip().str.lower()
+
+    df['fecha_dt'] = _desde_categorias(df['fecha'], _parsear_fechas, np.datetime64('NaT', 'ns'))
+    if pd.api.types.is_numeric_dtype(df['hora']):
+        df['hora_num'] = df['hora'].fillna(-1).astype(np.int8)
+    else:
+        df['hora_num'] = _desde_categorias(df['hora'], _parsear_horas, np.int8(-1))
+
+    for col in COLUMNAS_CONTEO:
+        df[col] = df[col].fillna(0).astype(np.int32)
+    df['total_bicis'] = df['hacia_ciudad_vieja'] + df['hacia_tres_cruces']
+    return df
+
+def leer_bloques(ruta_csv, tamano_bloque=TAMANO_BLOQUE):
+    """Lee el CSV en bloques con tipos fijados y devuelve cada bloque ya normalizado."""
+    # Leemos solo el encabezado para mapear los nombres crudos ('Fecha ', 'HORA') a los tipos
+    crudas = pd.read_csv(ruta_csv, encoding='utf-8', nrows=0).columns
+    tipos = {}
+    for col in crudas:
+        limpia = col.strip().lower()
+        if limpia in COLUMNAS_CONTEO:
+            tipos[col] = 'float32'  # float para tolerar vacíos; se pasa a int32 al normalizar
+        elif limpia in ('fecha', 'hora'):
+            tipos[col] = 'category'
+
+    lector = pd.read_csv(ruta_csv, encoding='utf-8', on_bad_lines='skip',
+                         dtype=tipos, chunksize=tamano_bloque)
+    for bloque in lector:
+        yield normalizar(bloque)
+
+def parsear_csv(ruta_csv, tamano_bloque=TAMANO_BLOQUE):
+    """Parsea el CSV completo por bloques. Devuelve (df, estadisticas) con filas/s."""
+    inicio = time.perf_counter()
+    bloques = list(leer_bloques(ruta_csv, tamano_bloque))
+    df = pd.concat(bloques, ignore_index=True) if bloques else normalizar(pd.read_csv(ruta_csv))
+    for col in ('fecha', 'hora'):
+        # Cada bloque trae sus propias categorías: al unir volvemos a compactar
+        if df[col].dtype == object or isinstance(df[col].dtype, pd.StringDtype):
+            df[col] = df[col].astype('category')
+
+    segundos = time.perf_counter() - inicio
+    estadisticas = {
+        'filas': len(df),
+        'segundos': segundos,
+        'filas_por_seg': len(df) / segundos if segundos > 0 else float('inf'),
+    }
+    return df, estadisticas
+
+def _firma_archivo(ruta):
+    """Identifica una versión del CSV crudo sin tener que leerlo (tamaño + fecha de modificación)."""
+    st_archivo = os.stat(ruta)
+    return f"{st_archivo.st_size}-{int(st_archivo.st_mtime)}-v{VERSION_FORMATO}"
+
+def construir_snapshot(ruta_csv, ruta_snapshot):
+    """Parsea el CSV una vez y guarda una foto Feather (Arrow) sin compresión."""
+    df, estadisticas = parsear_csv(ruta_csv)
+    log.info("%s filas parseadas a %s filas/s", f"{estadisticas['filas']:,}", f"{estadisticas['filas_por_seg']:,.0f}")
+
+    tabla = pa.Table.from_pandas(df, preserve_index=False)
+    tabla = tabla.replace_schema_metadata({
+        **(tabla.schema.metadata or {}),
+        b"firma": _firma_archivo(ruta_csv).encode(),
+    })
+    ruta_tmp = ruta_snapshot + ".tmp"
+    # Sin compresión para que la lectura pueda mapear el archivo en memoria (zero-copy)
+    feather.write_feather(tabla, ruta_tmp, compression="uncompressed")
+    os.replace(ruta_tmp, ruta_snapshot)
+    return df
+
+def leer_snapshot(ruta_snapshot):
+    """Lee la foto con memory-map. Devuelve (df, firma) o (None, None) si no sirve."""
+    if not os.path.exists(ruta_snapshot):
+        return None, None
+    try:
+        tabla = feather.read_table(ruta_snapshot, memory_map=True)
+    except (pa.ArrowInvalid, OSError):
+        return None, None
+    firma = (tabla.schema.metadata or {}).get(b"firma", b"").decode()
+    return tabla.to_pandas(), firma
+
+def cargar_ciclovia(fuente=None, url=URL_CICLOVIA, dir_cache=DIR_CACHE):
+    """Punto de entrada: devuelve el DataFrame de la ciclovía listo para graficar.
+
+    - fuente=None: usa el portal de datos abiertos con caché local y revalidación.
+    - fuente="ruta/a/archivo.csv": trabaja 100% offline con un CSV local.
+    """
+    os.makedirs(dir_cache, exist_ok=True)
+
+    if fuente:
+        ruta_csv = fuente
+    else:
+        ruta_csv = descargar_csv(url, dir_cache)
+
+    nombre_base = os.path.splitext(os.path.basename(ruta_csv))[0]
+    ruta_snapshot = os.path.join(dir_cache, nombre_base + ".feather")
+
+    df, firma = leer_snapshot(ruta_snapshot)
+    if df is not None and firma == _firma_archivo(ruta_csv):
+        return df
+    return construir_snapshot(ruta_csv, ruta_snapshot)
+
+
+# --- CUBO PRE-AGREGADO (DÍA x HORA x SENTIDO) ---
+# Recorremos las filas UNA sola vez y guardamos sumas y conteos en arrays de NumPy.
+# Todos los KPIs y gráficos salen de ahí en O(celdas), sin volver a escanear el DataFrame.
+
+SENTIDOS = ['hacia_ciudad_vieja', 'hacia_tres_cruces']
+
+DIAS_ES = {
+    'Monday': 'Lunes', 'Tuesday': 'Martes', 'Wednesday': 'Miércoles',
+    'Thursday': 'Jueves', 'Friday': 'Viernes', 'Saturday': 'Sábado', 'Sunday': 'Domingo'
+}
+ORDEN_DIAS = list(DIAS_ES.keys())
+
+def construir_cubo(df):
+    """Agrega el DataFrame en un cubo compacto: suma[día, hora, sentido] y cuenta[día, hora]."""
+    validas = df['fecha_dt'].notna() & df['hora_num'].between(0, 23)
+    fechas = df.loc[validas, 'fecha_dt'].to_numpy().astype('datetime64[D]')
+    horas = df.loc[validas, 'hora_num'].to_numpy().astype(np.int64)
+
+    # Ordinal de día: posición de cada fecha dentro de los días observados
+    dias, idx_dia = np.unique(fechas, return_inverse=True)
+    celda = idx_dia * 24 + horas
+    n_celdas = len(dias) * 24
+
+    suma = np.empty((len(dias), 24, len(SENTIDOS)), dtype=np.float64)
+    for s, col in enumerate(SENTIDOS):
+        pesos = df.loc[validas, col].to_numpy(dtype=np.float64, na_value=0.0)
+        suma[:, :, s] = np.bincount(celda, weights=pesos, minlength=n_celdas).reshape(-1, 24)
+    cuenta = np.bincount(celda, minlength=n_celdas).reshape(-1, 24)
+
+    return {'dias': dias, 'suma': suma, 'cuenta': cuenta}
+
+def _valores(cubo, columna):
+    """Devuelve la matriz [día, hora] del sentido pedido (o la suma de ambos)."""
+    if columna == 'total_bicis':
+        return cubo['suma'].sum(axis=2)
+    return cubo['suma'][:, :, SENTIDOS.index(columna)]
+
+def kpis(cubo):
+    """Total, promedio diario y día récord en una sola pasada sobre los totales diarios."""
+    por_dia = _valores(cubo, 'total_bicis').sum(axis=1)
+    if len(por_dia) == 0:
+        return {'total': 0, 'promedio_diario': 0, 'dia_pico_fecha': None, 'dia_pico_valor': 0}
+    i_pico = int(por_dia.argmax())
+    return {
+        'total': por_dia.sum(),
+        'promedio_diario': por_dia.mean(),
+        'dia_pico_fecha': pd.Timestamp(cubo['dias'][i_pico]),
+        'dia_pico_valor': por_dia[i_pico],
+    }
+
+def perfil_horario(cubo, columnas):
+    """Promedio por hora (equivale a groupby('hora_num')[columnas].mean())."""
+    if isinstance(columnas, str):
+        columnas = [columnas]
+    cuenta_hora = cubo['cuenta'].sum(axis=0)
+    horas = np.flatnonzero(cuenta_hora)
+    perfil = pd.DataFrame({'hora_num': horas})
+    for col in columnas:
+        perfil[col] = _valores(cubo, col).sum(axis=0)[horas] / cuenta_hora[horas]
+    return perfil
+
+def serie_diaria(cubo, columna):
+    """Total por día con el nombre del día y la etiqueta del pico de cada mes."""
+    diario = pd.DataFrame({
+        'fecha_dt': pd.to_datetime(cubo['dias']),
+        columna: _valores(cubo, columna).sum(axis=1),
+    })
+    diario['nombre_dia'] = diario['fecha_dt'].dt.day_name().map(DIAS_ES)
+
+    # Pico de cada mes: argmax dentro de cada bloque de días (O(días), no O(filas))
+    diario['etiqueta_pico'] = ""
+    if not diario.empty:
+        idx_maximos = diario.groupby(diario['fecha_dt'].dt.to_period('M'))[columna].idxmax()
+        diario.loc[idx_maximos, 'etiqueta_pico'] = diario.loc[idx_maximos, 'nombre_dia']
+    return diario
+
+def heatmap_semanal(cubo, columna='total_bicis'):
+    """Promedio por (día de la semana, hora) a partir del cubo."""
+    # datetime64[D] arranca en jueves 1970-01-01 -> corrimiento para que 0 = lunes
+    dia_semana = (cubo['dias'].astype(np.int64) + 3) % 7
+    suma = np.zeros((7, 24))
+    cuenta = np.zeros((7, 24))
+    np.add.at(suma, dia_semana, _valores(cubo, columna))
+    np.add.at(cuenta, dia_semana, cubo['cuenta'])
+
+    d, h = np.nonzero(cuenta)
+    return pd.DataFrame({
+        'dia_semana_en': np.array(ORDEN_DIAS)[d],
+        'hora_num': h,
+        columna: suma[d, h] / cuenta[d, h],
+    })
+
+
+# --- HISTÓRICO MULTI-AÑO / MULTI-SENSOR (PARQUET PARTICIONADO) ---
+# Cada CSV del portal (un año, un punto de conteo) se normaliza y se guarda en
+# .cache/stm/historico/sensor=.../anio=.../mes=.../ . La página lee solo las
+# particiones del sensor y rango de fechas elegidos (predicate pushdown).
+
+URL_CKAN_PAQUETE = "https://ckan-data.montevideo.gub.uy/api/3/action/package_show?id=15a3de29-2353-4d5f-9bae-e1617fa9e974"
+DIR_HISTORICO = os.path.join(DIR_CACHE, "historico")
+SENSOR_DEFECTO = "18_de_julio"
+
+# Si el CSV trae una columna que identifica el punto de conteo, la usamos fila a fila
+COLUMNAS_SENSOR = ['sensor', 'punto_conteo', 'contador', 'id_sensor']
+
+def listar_recursos(url_paquete=URL_CKAN_PAQUETE, timeout=30):
+    """Consulta la API de CKAN y devuelve los CSV disponibles del conjunto de datos."""
+    resp = requests.get(url_paquete, timeout=timeout)
+    resp.raise_for_status()
+    recursos = []
+    for r in resp.json()["result"]["resources"]:
+        if str(r.get("format", "")).upper() != "CSV":
+            continue
+        nombre = os.path.splitext(os.path.basename(r["url"].split("?")[0]))[0]
+        recursos.append({"url": r["url"], "nombre": nombre, "sensor": _sensor_de(nombre)})
+    return recursos
+
+def _sensor_de(nombre_recurso):
+    """'conteo_ciclovia_rambla_2024' -> 'rambla'. Sin sufijo, es la ciclovía de 18 de Julio."""
+    partes = [p for p in nombre_recurso.lower().split("_") if not p.isdigit()]
+    partes = [p for p in partes if p not in ("conteo", "ciclovia")]
+    return "_".join(partes) or SENSOR_DEFECTO
+
+def _carpeta_sensor(sensor, dir_historico=DIR_HISTORICO):
+    # pyarrow escapa los valores de partición como URI ('18 de Julio' -> '18%20de%20Julio')
+    return os.path.join(dir_historico, "sensor=" + urllib.parse.quote(str(sensor), safe=""))
+
+def ingerir_csv(ruta_csv, sensor=SENSOR_DEFECTO, dir_historico=DIR_HISTORICO, tamano_bloque=TAMANO_BLOQUE):
+    """Normaliza un CSV por bloques y lo escribe en el almacén particionado por sensor/año/mes.
+
+    Reemplaza las particiones que toca, así re-ingerir un año actualizado no duplica filas.
+    La memoria queda acotada a un bloque. Devuelve la cantidad de filas escritas.
+    """
+    inicio = time.perf_counter()
+    tocadas = set()
+    filas = 0
+    for n, df in enumerate(leer_bloques(ruta_csv, tamano_bloque)):
+        df = df[df['fecha_dt'].notna()]
+
+        # La columna de origen sale de la tabla antes de crear la partición 'sensor'
+        # (puede llamarse justamente 'sensor')
+        col_sensor = next((c for c in COLUMNAS_SENSOR if c in df.columns), None)
+        valores_sensor = df.pop(col_sensor).astype(str) if col_sensor else sensor
+        df['sensor'] = valores_sensor
+        df['anio'] = df['fecha_dt'].dt.year.astype('int16')
+        df['mes'] = df['fecha_dt'].dt.month.astype('int8')
+        # Guardamos fecha/hora como texto: cada bloque tendría un diccionario distinto
+        df['fecha'] = df['fecha'].astype(str)
+        df['hora'] = df['hora'].astype(str)
+
+        # La primera vez que un bloque toca una partición, borramos lo que había antes
+        for clave in df[['sensor', 'anio', 'mes']].drop_duplicates().itertuples(index=False):
+            if clave not in tocadas:
+                ruta = os.path.join(_carpeta_sensor(clave.sensor, dir_historico), f"anio={clave.anio}", f"mes={clave.mes}")
+                shutil.rmtree(ruta, ignore_errors=True)
+                tocadas.add(clave)
+
+        pq.write_to_dataset(
+            pa.Table.from_pandas(df, preserve_index=False), dir_historico,
+            partition_cols=['sensor', 'anio', 'mes'],
+            existing_data_behavior='overwrite_or_ignore',
+            basename_template=f"bloque-{n}-{{i}}.parquet",
+        )
+        filas += len(df)
+
+    segundos = time.perf_counter() - inicio
+    log.info("%s: %s filas a %s filas/s", os.path.basename(ruta_csv), f"{filas:,}", f"{filas / max(segundos, 1e-9):,.0f}")
+    return filas
+
+def actualizar_historico(dir_historico=DIR_HISTORICO, url_paquete=URL_CKAN_PAQUETE, dir_cache=DIR_CACHE):
+    """Baja (o revalida) todos los CSV del portal e ingiere solo los que cambiaron."""
+    os.makedirs(dir_historico, exist_ok=True)
+    ruta_registro = os.path.join(dir_historico, "_ingestados.json")
+    registro = _leer_meta(ruta_registro)
+
+    nuevos = 0
+    for recurso in listar_recursos(url_paquete):
+        ruta_csv = descargar_csv(recurso["url"], dir_cache)
+        firma = _firma_archivo(ruta_csv)
+        if registro.get(recurso["url"]) == firma:
+            continue
+        ingerir_csv(ruta_csv, recurso["sensor"], dir_historico)
+        registro[recurso["url"]] = firma
+        _guardar_meta(ruta_registro, registro)  # guardamos a medida, por si se corta a mitad
+        nuevos += 1
+    return nuevos
+
+# Tipos fijos para las carpetas: si pyarrow los adivina, un sensor con nombre numérico
+# (ej. id_sensor=123) sale int32 y el filtro por sensor (texto) falla
+PARTICIONES_HISTORICO = ds.partitioning(
+    pa.schema([('sensor', pa.string()), ('anio', pa.int16()), ('mes', pa.int8())]), flavor="hive")
+
+def _dataset_historico(dir_historico=DIR_HISTORICO):
+    return ds.dataset(dir_historico, format="parquet", partitioning=PARTICIONES_HISTORICO)
+
+def sensores_disponibles(dir_historico=DIR_HISTORICO):
+    """Lista los sensores mirando solo los nombres de las carpetas (no lee datos)."""
+    if not os.path.isdir(dir_historico):
+        return []
+    return sorted(
+        urllib.parse.unquote(d.split("=", 1)[1]) for d in os.listdir(dir_historico) if d.startswith("sensor=")
+    )
+
+def rango_disponible(sensor, dir_historico=DIR_HISTORICO):
+    """Primer y último mes con datos del sensor, deducidos de las particiones."""
+    dir_sensor = _carpeta_sensor(sensor, dir_historico)
+    meses = []
+    for d_anio in os.listdir(dir_sensor):
+        for d_mes in os.listdir(os.path.join(dir_sensor, d_anio)):
+            meses.append(pd.Period(year=int(d_anio.split("=")[1]), month=int(d_mes.split("=")[1]), freq="M"))
+    return min(meses).start_time.date(), max(meses).end_time.date()
+
+def cargar_historico(sensor, desde, hasta, dir_historico=DIR_HISTORICO):
+    """Lee solo las particiones (sensor, año, mes) que cubren [desde, hasta]."""
+    desde, hasta = pd.Timestamp(desde), pd.Timestamp(hasta)
+    anio, mes = ds.field('anio'), ds.field('mes')
+
+    # Filtro sobre las carpetas: pyarrow descarta las particiones fuera de rango sin abrirlas
+    filtro = (ds.field('sensor') == sensor)
+    filtro &= (anio > desde.year) | ((anio == desde.year) & (mes >= desde.month))
+    filtro &= (anio < hasta.year) | ((anio == hasta.year) & (mes <= hasta.month))
+    # Filtro fino por fecha dentro de los meses de borde
+    filtro &= (ds.field('fecha_dt') >= desde) & (ds.field('fecha_dt') < hasta + pd.Timedelta(days=1))
+
+    tabla = _dataset_historico(dir_historico).to_table(filter=filtro)
+    return tabla.drop_columns(['anio', 'mes']).to_pandas()
+
+
+# --- AUDITORÍA PAGINADA ---
+# La tabla se ordena una sola vez con un índice argsort y al navegador
+# solo viaja la página visible. El CSV se arma por bloques y solo cuando se pide.
+
+COLUMNAS_AUDITORIA = ['fecha', 'hora', 'total_bicis', 'hacia_ciudad_vieja', 'hacia_tres_cruces']
+
+def indice_orden(df, columna='total_bicis', descendente=True):
+    """Posiciones de las filas ordenadas por la columna (orden estable, O(n log n) una vez)."""
+    valores = df[columna].to_numpy()
+    orden = np.argsort(-valores if descendente else valores, kind='stable')
+    return orden
+
+def _vista_auditoria(df, posiciones):
+    vista = df[COLUMNAS_AUDITORIA].take(posiciones).copy()
+    # Traducimos el día solo para las filas que se van a mostrar
+    vista['Día'] = df['fecha_dt'].take(posiciones).dt.day_name().map(DIAS_ES).to_numpy()
+    return vista.rename(columns={'total_bicis': 'TOTAL'})
+
+def pagina_auditoria(df, orden, pagina, tamano_pagina=100):
+    """Devuelve solo las filas de la página pedida (pagina arranca en 1)."""
+    inicio = (pagina - 1) * tamano_pagina
+    return _vista_auditoria(df, orden[inicio:inicio + tamano_pagina])
+
+def exportar_csv(df, orden, tamano_bloque=100_000):
+    """Genera el CSV ordenado por bloques (bytes) para no duplicar todo el frame como texto."""
+    for inicio in range(0, len(orden), tamano_bloque):
+        bloque = _vista_auditoria(df, orden[inicio:inicio + tamano_bloque])
+        yield bloque.to_csv(index=False, header=(inicio == 0)).encode('utf-8')